@@ -0,0 +1,108 @@
+"""
+JSON 编解码基准测试
+对比 orjson / msgspec / 标准库 json 在搜索响应解析和合并转发消息序列化上的耗时
+
+用法：
+    python benchmarks/bench_codec.py [--songs 50] [--nodes 40] [--rounds 2000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import codec  # noqa: E402
+
+
+def build_search_payload(songs: int) -> bytes:
+    """构造上游搜索接口响应"""
+    data = [
+        {
+            'n': i + 1,
+            'song_title': f'歌曲标题 {i}',
+            'song_singer': f'歌手 {i % 7}',
+            'album': f'专辑 {i % 5}',
+            'interval': '04:12',
+        }
+        for i in range(songs)
+    ]
+    return codec.get_codec('json').dumps({'code': 200, 'msg': 'success', 'data': data})
+
+
+def build_forward_payload(nodes: int) -> dict:
+    """构造合并转发消息请求体"""
+    return {
+        'group_id': 123456789,
+        'prompt': '🎵 音乐链接',
+        'summary': f'音乐下载链接 | 共{nodes}条内容',
+        'source': 'musicLink',
+        'messages': [
+            {
+                'type': 'node',
+                'data': {
+                    'user_id': '10000',
+                    'nickname': 'musicLink',
+                    'content': [
+                        {'type': 'text', 'data': {'text': f'📱 备用下载链接：\nhttps://example.com/{i}.flac?sign=' + 'x' * 200}},
+                    ],
+                },
+            }
+            for i in range(nodes)
+        ],
+    }
+
+
+def legacy_search_parse(payload: dict) -> list:
+    """旧版逐字段校验的搜索结果解析"""
+    valid_songs = []
+    if payload.get('code') == 200 and isinstance(payload.get('data'), list):
+        for song in payload.get('data', []):
+            if isinstance(song, dict) and all(k in song for k in ['n', 'song_title', 'song_singer']):
+                valid_songs.append({
+                    'n': song['n'],
+                    'song_name': song['song_title'],
+                    'song_singer': song['song_singer']
+                })
+    return valid_songs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--songs', type=int, default=50)
+    parser.add_argument('--nodes', type=int, default=40)
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+
+    search_raw = build_search_payload(args.songs)
+    forward = build_forward_payload(args.nodes)
+    std = codec.get_codec('json')
+
+    print(f"可用编解码器: {', '.join(codec.available_codecs())}（当前: {codec.get_codec().name}）")
+    print(f"搜索响应 {len(search_raw)} 字节，合并转发请求 {len(std.dumps(forward))} 字节，{args.rounds} 轮\n")
+    print(f"{'编解码器':<10}{'搜索解析(µs)':>16}{'转发序列化(µs)':>18}{'转发反序列化(µs)':>20}")
+
+    legacy = timeit.timeit(lambda: legacy_search_parse(std.loads(search_raw)), number=args.rounds)
+    print(f"{'json(旧)':<10}{legacy / args.rounds * 1e6:>16.1f}{'-':>18}{'-':>20}")
+
+    for name in codec.available_codecs():
+        c = codec.get_codec(name)
+        parse = lambda: codec._lenient_search(c.loads(search_raw))  # noqa: E731
+        encoded = c.dumps(forward)
+        t_parse = timeit.timeit(parse, number=args.rounds)
+        t_dump = timeit.timeit(lambda: c.dumps(forward), number=args.rounds)
+        t_load = timeit.timeit(lambda: c.loads(encoded), number=args.rounds)
+        print(
+            f"{name:<10}{t_parse / args.rounds * 1e6:>16.1f}"
+            f"{t_dump / args.rounds * 1e6:>18.1f}{t_load / args.rounds * 1e6:>20.1f}"
+        )
+
+    if codec.msgspec is not None:
+        # 按类型结构一次性解码校验（parse_search_response 的快速路径）
+        t_typed = timeit.timeit(lambda: codec.parse_search_response(search_raw), number=args.rounds)
+        print(f"{'msgspec(类型)':<10}{t_typed / args.rounds * 1e6:>16.1f}{'-':>18}{'-':>20}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+内存占用基准测试
+对比字典与紧凑记录存储搜索结果和待选择会话时的内存占用（tracemalloc 统计）
+
+用法：
+    python benchmarks/bench_memory.py [--songs 100000] [--sessions 100000] [--per-search 30] [--singers 500]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import codec  # noqa: E402
+from utils.records import Session  # noqa: E402
+
+
+def build_search_responses(songs: int, per_search: int, singers: int) -> list:
+    """构造上游搜索接口响应，歌手从有限集合中重复出现"""
+    std = codec.get_codec('json')
+    responses = []
+    for start in range(0, songs, per_search):
+        data = [
+            {'n': i + 1, 'song_title': f'歌曲标题 {start + i}', 'song_singer': f'歌手 {(start + i) % singers}'}
+            for i in range(min(per_search, songs - start))
+        ]
+        responses.append(std.dumps({'code': 200, 'msg': 'success', 'data': data}))
+    return responses
+
+
+def legacy_search_parse(raw: bytes) -> list:
+    """旧版解析：每首歌一个字典"""
+    payload = codec.loads(raw)
+    return [
+        {'n': song['n'], 'song_name': song['song_title'], 'song_singer': song['song_singer']}
+        for song in payload['data']
+    ]
+
+
+def measure(build) -> tuple:
+    """
+    测量构造对象占用的内存
+
+    Returns:
+        (对象, 占用字节数)
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--songs', type=int, default=100000)
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--per-search', type=int, default=30)
+    parser.add_argument('--singers', type=int, default=500)
+    args = parser.parse_args()
+
+    responses = build_search_responses(args.songs, args.per_search, args.singers)
+    print(f"搜索结果 {args.songs} 首（每次搜索 {args.per_search} 首，{args.singers} 位歌手），"
+          f"待选择会话 {args.sessions} 个，编解码器: {codec.get_codec().name}\n")
+    print(f"{'存储方式':<12}{'每首歌曲(字节)':>16}{'每个会话(字节)':>16}")
+
+    # 会话只统计会话本身（按用户ID保存），搜索结果与缓存共享
+    # 旧版会话：user_searches[user_id] = search_results[:10]，即每个用户一个歌曲字典列表
+    legacy_songs, legacy_bytes = measure(lambda: [legacy_search_parse(raw) for raw in responses])
+    _, legacy_session_bytes = measure(lambda: {
+        str(i): legacy_songs[i % len(legacy_songs)][:10]
+        for i in range(args.sessions)
+    })
+    print(f"{'字典':<12}{legacy_bytes / args.songs:>16.1f}{legacy_session_bytes / args.sessions:>16.1f}")
+    del legacy_songs
+    gc.collect()
+
+    songs, song_bytes = measure(lambda: [codec.parse_search_response(raw) for raw in responses])
+    _, session_bytes = measure(lambda: {
+        str(i): Session(songs[i % len(songs)], None, 0, False)
+        for i in range(args.sessions)
+    })
+    print(f"{'紧凑记录':<12}{song_bytes / args.songs:>16.1f}{session_bytes / args.sessions:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+插件启动耗时基准测试
+分别在全新的解释器进程中测量模块导入耗时，
+并测量从 initialize() 开始到处理完第一条消息（命中缓存的点歌）的耗时
+
+用法：
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 需要测量导入耗时的模块
+IMPORT_TARGETS = [
+    'utils',
+    'utils.music_card',
+    'utils.forward_message',
+    'utils.url_shortener',
+    'components.event_listener.default',
+]
+
+
+def measure_import(module: str, repeat: int) -> float:
+    """在全新进程中导入模块，返回耗时中位数（毫秒）"""
+    code = (
+        "import sys, time; sys.path.insert(0, %r); t = time.perf_counter(); "
+        "import %s; print((time.perf_counter() - t) * 1000)" % (ROOT, module)
+    )
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout.strip()))
+    return statistics.median(samples)
+
+
+class _StubPlugin:
+    """提供插件配置"""
+
+    def get_config(self):
+        # 关闭出站合并窗口，使回复立即发出
+        return {'outbound_window_ms': 0}
+
+
+class _StubEvent:
+    def __init__(self, text):
+        from langbot_plugin.api.entities.builtin.platform import message as platform_message
+        self.message_chain = platform_message.MessageChain([platform_message.Plain(text=text)])
+        self.sender_id = 10001
+        self.launcher_type = 'group'
+        self.launcher_id = 20002
+
+
+class _StubEventContext:
+    def __init__(self, text):
+        self.event = _StubEvent(text)
+        self.replied_at = None
+
+    async def reply(self, message_chain):
+        self.replied_at = time.perf_counter()
+
+    def prevent_default(self):
+        pass
+
+
+async def measure_first_message() -> float:
+    """测量 initialize() 到第一条回复发出的耗时（毫秒）"""
+    from components.event_listener.default import DefaultEventListener
+    from utils.query import normalize_query
+    from utils.records import make_song
+
+    class BenchListener(DefaultEventListener):
+        def __init__(self):
+            self.plugin = _StubPlugin()
+            self.handlers = []
+
+        def handler(self, event_type):
+            def decorator(func):
+                if func not in self.handlers:
+                    self.handlers.append(func)
+                return func
+            return decorator
+
+    listener = BenchListener()
+    start = time.perf_counter()
+    await DefaultEventListener.initialize(listener)
+    initialized = time.perf_counter()
+
+    # 预置缓存，避免测量上游网络耗时
+    await listener.search_cache.set(
+        normalize_query('晴天'),
+        [make_song(1, '晴天', '周杰伦')]
+    )
+    event_context = _StubEventContext('点歌 晴天')
+    await listener.handlers[0](event_context)
+    if listener.cache_warmer:
+        listener.cache_warmer.stop()
+    print(f"  initialize(): {(initialized - start) * 1000:.2f} ms")
+    return (event_context.replied_at - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"模块导入耗时（全新进程，{args.repeat} 次中位数）：")
+    for module in IMPORT_TARGETS:
+        try:
+            print(f"  {module:<40}{measure_import(module, args.repeat):>8.2f} ms")
+        except subprocess.CalledProcessError as e:
+            print(f"  {module:<40}{'导入失败':>8}  {e.stderr.strip().splitlines()[-1]}")
+
+    print("\n首条消息处理耗时：")
+    try:
+        print(f"  initialize() -> 首条回复: {asyncio.run(measure_first_message()):.2f} ms")
+    except ImportError as e:
+        print(f"  跳过（缺少依赖: {e}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,328 +4,1149 @@ from __future__ import annotations
 
 import asyncio
 import aiohttp
+import datetime
 import os
 from langbot_plugin.api.definition.components.common.event_listener import EventListener
 from langbot_plugin.api.entities import events, context
 from langbot_plugin.api.entities.builtin.platform import message as platform_message
 from langbot_plugin.api.entities.builtin.provider import message as provider_message
-# 导入音乐卡片发送工具和短链接服务
-from utils.music_card import MusicCardSender
-from utils.url_shortener import shorten_url
-from utils.forward_message import ForwardMessageSender
+# 核心工具；音乐卡片、合并转发、热度预热、音质协商、链接探测、追踪记录、出站合并等可选子系统在首次使用时才导入和初始化
+from utils.cache import TTLCache
+from utils.metrics import metrics
+from utils.codec import parse_search_response, parse_detail_response
+from utils.query import QUALITY_LEVELS, BEST_BITRATE, normalize_query, parse_quality_suffix
+from utils.state import MemoryStateBackend, create_state_backend
+from utils.spans import span
+from utils.dedup import DedupCache, message_fingerprint
+from utils.scheduler import PriorityScheduler, PRIORITY_DETAIL, PRIORITY_SEARCH, PRIORITY_BACKGROUND
+from utils.health import HealthMonitor, UpstreamUnavailable
+from utils.records import Session, SongDetail, songs_from_raw, session_from_raw, detail_from_raw
+from utils.deadline import Deadline, DeadlineExceeded, stage_timeout
+from utils.http_pool import http_pool, shared_session
+
+# 上游音乐接口地址
+MUSIC_API_URL = "http://lpz.chatc.vip/apiqq.php"
+# 降级期间健康检查使用的搜索词
+HEALTH_CHECK_QUERY = "晴天"
 
 class DefaultEventListener(EventListener):
-    # 存储用户的搜索结果和状态
-    user_searches = {}
-    # 音乐卡片发送器实例
-    music_card_sender = None
-    # 合并转发消息发送器实例
-    forward_message_sender = None
+    # 状态存储后端（用户搜索会话、缓存、限流计数），可配置为多实例共享
+    state_backend = None
+    # 选择歌曲的等待时间（秒），翻页时重新计时
+    selection_timeout = 5
+    # 单条消息处理的总时间预算（秒），各阶段只使用剩余时间
+    interaction_timeout = 20
+    # 每页显示的歌曲数和单次向上游获取的歌曲数
+    page_size = 10
+    search_fetch_size = 30
+    # 插件配置
+    config = {}
+    # 音乐卡片发送器实例（首次使用时创建）
+    _music_card_sender = None
+    # 合并转发消息发送器实例（首次使用时创建）
+    _forward_message_sender = None
     # NapCat配置
     napcat_http_url = "http://127.0.0.1:3000"  # NapCat HTTP API地址默认值
     napcat_access_token = None  # 访问令牌（如果需要的话）
+    onebot_access_token = ""
+    # 上游请求优先级调度器
+    upstream_scheduler = None
+    # 上游健康状态，连续失败时进入降级模式，只使用本地缓存
+    upstream_health = None
+    # 连接保活间隔（秒），为0时只在启动时预热连接
+    keepalive_interval = 30
+    _keepalive_task = None
+    # 重复投递消息的去重缓存
+    dedup_cache = None
+    # 搜索结果缓存与歌曲详情缓存
+    search_cache = None
+    detail_cache = None
+    # 降级模式下使用的长期搜索结果缓存
+    stale_search_cache = None
+    # 进程内存储时每个缓存的最大条目数
+    cache_max_size = 2048
+    # 空结果/失败结果缓存及其过期时间（秒），失败结果只短暂缓存
+    negative_cache = None
+    negative_empty_ttl = 60
+    negative_error_ttl = 5
+    # 热度统计与后台预热（首次使用时创建）
+    _popularity_tracker = None
+    cache_warmer = None
+    # 音质协商器与链接探测器（首次使用时创建）
+    _quality_negotiator = None
+    _link_prober = None
+    # 交互追踪记录器（首次使用时创建）
+    _tracer = None
+    # 插件数据目录（追踪记录等）
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+    # 出站回复合并缓冲（首次使用时创建）
+    _outbound = None
+    # 同一窗口内达到该条数时，群聊以合并转发发送
+    outbound_forward_threshold = 3
+    # 可使用管理指令的用户ID
+    admin_users = frozenset()
+    # 进行中的性能分析（管理员开启）
+    _profile_session = None
+    # 每日定时群发任务
+    _broadcast_task = None
+    # 音频中转服务（启用时音乐卡片的音频链接指向本服务）
+    audio_relay = None
     
     async def initialize(self):
         await super().initialize()
 
-        # 初始化音乐卡片发送器
-        # 可以从环境变量或配置文件读取NapCat配置
-        self.napcat_http_url = self.plugin.get_config().get('napcat_url', self.napcat_http_url)
-        self.onebot_access_token = self.plugin.get_config().get("onebot_access_token", "")
-        napcat_url = os.getenv('NAPCAT_HTTP_URL', self.napcat_http_url)
+        # 读取NapCat配置，可以从环境变量覆盖地址
+        config = self.plugin.get_config()
+        self.config = config
+        self.napcat_http_url = os.getenv('NAPCAT_HTTP_URL', config.get('napcat_url', self.napcat_http_url))
+        self.onebot_access_token = config.get("onebot_access_token", "")
+        self.data_dir = config.get('data_dir') or self.data_dir
+        self.interaction_timeout = float(config.get('interaction_timeout_s', self.interaction_timeout))
+        self.admin_users = frozenset(
+            user.strip() for user in str(config.get('admin_users', '')).split(',') if user.strip()
+        )
+
+        # 初始化状态存储后端（Redis 后端在首次请求时才建立连接）
+        self.state_backend = create_state_backend(
+            config.get('state_backend', 'memory'),
+            config.get('redis_url', '')
+        )
+
+        # 分页配置：一次获取较多结果，翻页时只在缓存的结果中移动
+        self.page_size = max(1, int(config.get('page_size', self.page_size)))
+        self.search_fetch_size = max(self.page_size, int(config.get('search_fetch_size', self.search_fetch_size)))
 
-        self.music_card_sender = MusicCardSender(
-            http_url=napcat_url,
-            access_token=self.onebot_access_token if self.onebot_access_token else None
+        # 初始化上游请求调度器：详情请求优先于搜索，后台任务最后
+        self.upstream_scheduler = PriorityScheduler(
+            max_concurrency=int(config.get('upstream_concurrency', 4))
         )
 
-        # 初始化合并转发消息发送器
-        self.forward_message_sender = ForwardMessageSender(
-            http_url=napcat_url,
-            access_token=self.onebot_access_token if self.onebot_access_token else None
+        # 初始化上游健康状态监控，降级期间定期探测上游是否恢复
+        self.upstream_health = HealthMonitor(
+            failure_threshold=int(config.get('degrade_failure_threshold', 3)),
+            probe_interval=int(config.get('health_probe_interval', 15)),
+            probe=self._probe_upstream
+        )
+
+        # 预热到 NapCat 和上游接口的连接，并定期保活
+        self.keepalive_interval = int(config.get('keepalive_interval_s', self.keepalive_interval))
+        self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+        # 启动音频中转服务（可选，需要 QQ 客户端能访问 relay_public_url）
+        if config.get('relay_enabled', False) and not config.get('relay_public_url'):
+            # 监听地址（如 0.0.0.0）客户端无法访问，没有公网地址时不启用中转
+            print("未配置 relay_public_url，音频中转服务不会启动，音乐卡片将直接使用上游链接")
+        elif config.get('relay_enabled', False):
+            from utils.audio_relay import AudioRelay
+            relay = AudioRelay(
+                os.path.join(self.data_dir, 'audio'),
+                config['relay_public_url'],
+                host=config.get('relay_host', '0.0.0.0'),
+                port=int(config.get('relay_port', 18080)),
+                max_cache_bytes=int(config.get('relay_cache_mb', 1024)) * 1024 * 1024,
+                refresh=self._refresh_relay_url
+            )
+            try:
+                await relay.start()
+                self.audio_relay = relay
+            except Exception as e:
+                print(f"音频中转服务启动失败，音乐卡片将直接使用上游链接: {str(e)}")
+
+        # 配置了群发时间、目标群和歌曲时启动每日群发
+        if config.get('broadcast_time') and config.get('broadcast_groups') and config.get('broadcast_songs'):
+            self._broadcast_task = asyncio.create_task(self._broadcast_loop())
+
+        # 初始化消息去重缓存
+        self.dedup_cache = DedupCache(window=int(config.get('dedup_window_s', 60)))
+
+        # 初始化缓存（进程内存储时每个缓存各自限制容量，互不挤占）
+        self.cache_max_size = max(1, int(config.get('cache_max_size', self.cache_max_size)))
+        self.search_cache = TTLCache(
+            ttl=int(config.get('search_cache_ttl', 600)), max_size=self.cache_max_size,
+            backend=self._cache_backend(), namespace='search'
+        )
+        self.detail_cache = TTLCache(
+            ttl=int(config.get('detail_cache_ttl', 300)), max_size=self.cache_max_size,
+            backend=self._cache_backend(), namespace='detail'
+        )
+        self.stale_search_cache = TTLCache(
+            ttl=int(config.get('stale_cache_ttl', 86400)), max_size=self.cache_max_size,
+            backend=self._cache_backend(), namespace='stale_search'
+        )
+        self.negative_empty_ttl = int(config.get('negative_empty_ttl', self.negative_empty_ttl))
+        self.negative_error_ttl = int(config.get('negative_error_ttl', self.negative_error_ttl))
+        self.negative_cache = TTLCache(
+            ttl=self.negative_empty_ttl, max_size=self.cache_max_size,
+            backend=self._cache_backend(), namespace='negative'
         )
         
         @self.handler(events.PersonMessageReceived)
         @self.handler(events.GroupMessageReceived)
         async def handler(event_context: context.EventContext):
-            # 获取消息内容
-            # print(event_context.event)
-            message_chain = event_context.event.message_chain
-            message = "".join(
-                element.text for element in message_chain
-                if isinstance(element, platform_message.Plain)
-            ).strip()
+            # OneBot 重连时可能重复投递同一条消息，在做任何处理前丢弃
+            if await self.is_duplicate_message(event_context):
+                metrics.incr('dedup.dropped')
+                return
+
+            trace = self.tracer.start_trace(
+                'message',
+                launcher_type=str(event_context.event.launcher_type),
+                sender_id=str(event_context.event.sender_id)
+            )
+            # 只统计开启性能分析之后收到的消息
+            profile_session = self._profile_session
+            deadline = Deadline(self.interaction_timeout)
+            try:
+                await self.handle_message(event_context, trace, deadline)
+            finally:
+                trace.finish()
+                if profile_session is not None:
+                    profile_session.record_event()
+
+    def _cache_backend(self):
+        """
+        缓存使用的存储后端
+
+        使用共享后端时各缓存与会话共用同一后端（按命名空间区分）；
+        使用进程内存储时返回None，由每个缓存创建各自限制容量的存储，
+        避免大量会话或搜索结果把降级时依赖的长期缓存挤出
+        """
+        if isinstance(self.state_backend, MemoryStateBackend):
+            return None
+        return self.state_backend
+
+    async def is_duplicate_message(self, event_context: context.EventContext) -> bool:
+        """
+        判断消息是否在去重窗口内已经处理过
+
+        使用共享状态后端时通过原子的“不存在时写入”去重，多个实例收到同一条消息时只有一个处理
+        """
+        event = event_context.event
+        message_id = None
+        timestamp = getattr(event, 'time', None)
+        for element in event.message_chain:
+            if isinstance(element, platform_message.Source):
+                message_id = element.id
+                timestamp = element.time
+                break
+        text = "".join(
+            element.text for element in event.message_chain
+            if isinstance(element, platform_message.Plain)
+        )
+        key = message_fingerprint(
+            message_id, event.sender_id, event.launcher_type, event.launcher_id, text, timestamp
+        )
+        if key is None:
+            return False
+        if self.dedup_cache.check_and_add(key):
+            return True
+        if isinstance(self.state_backend, MemoryStateBackend):
+            return False
+        try:
+            return not await self.state_backend.set_if_absent(
+                f"dedup:{key}", 1, ttl=self.dedup_cache.window
+            )
+        except Exception as e:
+            # 共享后端不可用时只使用本实例的去重结果
+            print(f"共享去重检查失败: {str(e)}")
+            return False
+
+    async def handle_message(self, event_context: context.EventContext, trace=None, deadline=None):
+        """处理私聊和群聊消息，deadline 为本次交互的截止时间"""
+        # 获取消息内容
+        # print(event_context.event)
+        message_chain = event_context.event.message_chain
+        message = "".join(
+            element.text for element in message_chain
+            if isinstance(element, platform_message.Plain)
+        ).strip()
+        
+        # 获取用户ID
+        user_id = str(event_context.event.sender_id)
+        launcher_type = event_context.event.launcher_type
+        session_key = f"session:{user_id}"
+
+        # 管理员指令：按需开启性能分析
+        if message.startswith("性能分析") and user_id in self.admin_users:
+            await self.handle_profile_command(event_context, message[len("性能分析"):])
+            event_context.prevent_default()
+            return
+
+        # 翻页：在会话中缓存的完整搜索结果里移动，不会再次请求上游
+        if message in ("下一页", "上一页"):
+            session = session_from_raw(await self.state_backend.get(session_key))
+            if session is None:
+                return
+            page = session.page + (1 if message == "下一页" else -1)
+            if 0 <= page < self._page_count(session.songs):
+                session = session._replace(page=page)
+                await self.state_backend.set(session_key, session, ttl=self.selection_timeout)
+                reply_text = self._render_search_page(session)
+            else:
+                reply_text = "已经是最后一页了" if page > 0 else "已经是第一页了"
+            await self.send_reply(event_context, [
+                platform_message.Plain(text=reply_text),
+            ])
+            event_context.prevent_default()
+            return
+
+        # 检查是否是选择歌曲的数字
+        session = session_from_raw(await self.state_backend.get(session_key)) if message.isdigit() else None
+        if session is not None:
+            # 用户在选择歌曲
+            song_index = int(message) - 1
+            search_results = session.songs
             
-            # 获取用户ID
-            user_id = str(event_context.event.sender_id)
-            launcher_type = event_context.event.launcher_type
-            # 检查是否是选择歌曲的数字
-            if user_id in self.user_searches and message.isdigit():
-                # 用户在选择歌曲
-                song_index = int(message) - 1
-                search_results = self.user_searches.get(user_id, [])
+            if 0 <= song_index < len(search_results):
+                # 原子地认领并移除用户的搜索记录，已被其他实例认领时直接忽略
+                if await self.state_backend.getdel(session_key) is None:
+                    return
+
+                # 获取选择的歌曲详情并校验链接，链接失效时回退到同名的其他候选
+                song_info, song_detail = await self.resolve_playable_detail(
+                    search_results, song_index, session.quality, trace=trace, deadline=deadline
+                )
                 
-                if 0 <= song_index < len(search_results):
-                    # 获取选择的歌曲信息
-                    song_info = search_results[song_index]
-                    # 调用API获取歌曲详情，使用song_title和n参数
-                    song_detail = await self.get_song_detail(song_info['song_name'], song_info['n'])
-                    
-                    # 移除用户的搜索记录
-                    if user_id in self.user_searches:
-                        del self.user_searches[user_id]
-                    
-                    # 处理歌曲详情信息
-                    data = song_detail.get('data', {})
-                    cover_url = data.get('cover', '')
-                    music_url = data.get('music_url', '')
-                    link_ = data.get('link', '')
-
-                    # 清理可能包含的额外字符（如空格和反引号）
-                    cover_url = cover_url.strip(' `')
-                    music_url = music_url.strip(' `')
-
-                    # 判断消息来源（群聊还是私聊）
-                    if launcher_type == 'group':
-                        target_type = 'group'
-                        target_id = str(event_context.event.launcher_id)
-                    else:
-                        target_type = 'private'
-                        target_id = user_id
-                    
-
-                    # 尝试通过NapCat发送音乐卡片
-                    if self.music_card_sender:
-                        try:
-                            # 发送音乐卡片
-                            card_result = await self.music_card_sender.send_custom_music_card(
-                                target_id=target_id,
-                                target_type=target_type,
-                                title=f"{song_info['song_name']} - {song_info['song_singer']}",
-                                audio_url=music_url,
-                                jump_url=link_,
-                                image_url=cover_url,
-                                content=f"由 musicLink 提供"
-                            )
+                # 处理歌曲详情信息（链接中多余的空格和反引号已在解析时清理）
+                cover_url = song_detail.cover
+                music_url = song_detail.music_url
+                link_ = song_detail.link
+
+                if not music_url and self.upstream_health.degraded:
+                    # 降级期间没有缓存的歌曲详情，无法提供链接
+                    await self.send_reply(event_context, [
+                        platform_message.Plain(text="⚠️ 音乐服务暂时不可用，请稍后再试"),
+                    ])
+                    event_context.prevent_default()
+                    return
+                if not music_url and deadline is not None and deadline.expired:
+                    # 时间预算内未能获取到歌曲详情
+                    await self.send_reply(event_context, [
+                        platform_message.Plain(text="⚠️ 获取歌曲超时，请稍后再试"),
+                    ])
+                    event_context.prevent_default()
+                    return
+                if not music_url:
+                    # 没有可用的播放链接时不发送空的音乐卡片
+                    await self.send_reply(event_context, [
+                        platform_message.Plain(text="⚠️ 获取歌曲链接失败，请稍后再试"),
+                    ])
+                    event_context.prevent_default()
+                    return
 
-                            if card_result.get('success'):
-                                # 音乐卡片发送成功，使用合并转发发送备用下载链接
-                                # 仅在群聊时发送合并转发，私聊仍使用普通消息
-                                if target_type == 'group':
-                                    # 构建合并转发消息
-                                    messages = [
-                                        {
-                                            "content": [
-                                                {"type": "text", "data": {"text": "✅ 音乐卡片已发送"}},
-                                            ]
-                                        },
-                                        {
-                                            "content": [
-                                                {"type": "text", "data": {"text": f"🎵 歌曲：{song_info['song_name']} - {song_info['song_singer']}"}},
-                                            ]
-                                        },
-                                        {
-                                            "content": [
-                                                {"type": "text", "data": {"text": f"📱 备用下载链接：\n{music_url}"}},
-                                            ]
-                                        },
-                                        {
-                                            "content": [
-                                                {"type": "text", "data": {"text": f"🔗 在线试听链接：\n{link_}"}},
-                                            ]
-                                        }
+                # 判断消息来源（群聊还是私聊）
+                if launcher_type == 'group':
+                    target_type = 'group'
+                    target_id = str(event_context.event.launcher_id)
+                else:
+                    target_type = 'private'
+                    target_id = user_id
+                
+
+                # 尝试通过NapCat发送音乐卡片
+                try:
+                    # 发送音乐卡片
+                    card_result = await self.music_card_sender.send_custom_music_card(
+                        target_id=target_id,
+                        target_type=target_type,
+                        title=f"{song_info.song_name} - {song_info.song_singer}",
+                        audio_url=await self.relay_audio_url(music_url, song_info.song_name, song_info.n),
+                        jump_url=link_,
+                        image_url=cover_url,
+                        content=f"由 musicLink 提供",
+                        trace=trace,
+                        deadline=deadline
+                    )
+
+                    if card_result.get('success'):
+                        # 音乐卡片发送成功，使用合并转发发送备用下载链接
+                        # 仅在群聊时发送合并转发，私聊仍使用普通消息
+                        if target_type == 'group':
+                            # 构建合并转发消息
+                            messages = [
+                                {
+                                    "content": [
+                                        {"type": "text", "data": {"text": "✅ 音乐卡片已发送"}},
+                                    ]
+                                },
+                                {
+                                    "content": [
+                                        {"type": "text", "data": {"text": f"🎵 歌曲：{song_info.song_name} - {song_info.song_singer}"}},
+                                    ]
+                                },
+                                {
+                                    "content": [
+                                        {"type": "text", "data": {"text": f"📱 备用下载链接：\n{music_url}"}},
                                     ]
+                                },
+                                {
+                                    "content": [
+                                        {"type": "text", "data": {"text": f"🔗 在线试听链接：\n{link_}"}},
+                                    ]
+                                }
+                            ]
 
-                                    # 发送合并转发消息
-                                    forward_result = await self.forward_message_sender.send_forward(
-                                        group_id=int(target_id),
-                                        messages=messages,
-                                        prompt="🎵 音乐链接",
-                                        summary="音乐下载链接",
-                                        source="musicLink",
-                                        nickname="musicLink",
-                                        mode="multi"
-                                    )
-
-                                    if not forward_result.get('success'):
-                                        # 合并转发发送失败，回退到普通消息
-                                        await event_context.reply(
-                                            platform_message.MessageChain([
-                                                platform_message.Plain(text=f"✅ 音乐卡片已发送\n"),
-                                                platform_message.Plain(text=f"📱 备用下载链接：{music_url}\n"),
-                                            ])
-                                        )
-                                else:
-                                    # 私聊使用普通消息
-                                    await event_context.reply(
-                                        platform_message.MessageChain([
-                                            platform_message.Plain(text=f"✅ 音乐卡片已发送\n"),
-                                            platform_message.Plain(text=f"📱 备用下载链接：{music_url}\n"),
-                                        ])
-                                    )
-                            else:
-                                # 卡片发送失败，回退到传统方式
-                                raise Exception(f"Music card send failed: {card_result.get('error', 'Unknown')}")
-                        except Exception as e:
-                            # 如果卡片发送失败，使用传统方式发送
-                            print(f"音乐卡片发送失败，使用传统方式: {str(e)}")
-                            # 使用音乐下载链接作为在线试听链接
-                            listen_url = link_
-                            # 缩短下载链接
-                            # short_music_url = await shorten_url(music_url)
-                            # short_listen_url = await shorten_url(listen_url)
-                            short_music_url = music_url
-                            short_listen_url = listen_url
-
-                            await event_context.reply(
-                                platform_message.MessageChain([
-                                    platform_message.Image(url=cover_url),
-                                    platform_message.Plain(text=f"歌曲：{song_info['song_name']}\n"),
-                                    platform_message.Plain(text=f"歌手：{song_info['song_singer']}\n"),
-                                    platform_message.Plain(text=f"在线试听链接：{short_listen_url}\n"),
-                                    platform_message.Plain(text=f"音乐下载链接：{short_music_url}\n"),
-                                ])
+                            # 发送合并转发消息
+                            forward_result = await self.forward_message_sender.send_forward(
+                                group_id=int(target_id),
+                                messages=messages,
+                                prompt="🎵 音乐链接",
+                                summary="音乐下载链接",
+                                source="musicLink",
+                                nickname="musicLink",
+                                mode="multi",
+                                trace=trace,
+                                deadline=deadline
                             )
-                    else:
-                        # 没有配置音乐卡片发送器，使用传统方式
-                        listen_url = link_
-                        # 缩短链接
-                        # short_music_url = await shorten_url(music_url)
-                        # short_listen_url = await shorten_url(listen_url)
-                        short_music_url = music_url
-                        short_listen_url = listen_url
-
-                        await event_context.reply(
-                            platform_message.MessageChain([
-                                platform_message.Image(url=cover_url),
-                                platform_message.Plain(text=f"歌曲：{song_info['song_name']}\n"),
-                                platform_message.Plain(text=f"歌手：{song_info['song_singer']}\n"),
-                                platform_message.Plain(text=f"在线试听链接：{short_listen_url}\n"),
-                                platform_message.Plain(text=f"音乐下载链接：{short_music_url}\n"),
+
+                            if not forward_result.get('success'):
+                                # 合并转发发送失败，回退到普通消息
+                                await self.send_reply(event_context, [
+                                    platform_message.Plain(text=f"✅ 音乐卡片已发送\n"),
+                                    platform_message.Plain(text=f"📱 备用下载链接：{music_url}\n"),
+                                ])
+                        else:
+                            # 私聊使用普通消息
+                            await self.send_reply(event_context, [
+                                platform_message.Plain(text=f"✅ 音乐卡片已发送\n"),
+                                platform_message.Plain(text=f"📱 备用下载链接：{music_url}\n"),
                             ])
-                        )
-                    event_context.prevent_default()
-                else:
-                    await event_context.reply(
-                        platform_message.MessageChain([
-                            platform_message.Plain(text="无效的选择，请输入正确的序号！"),
-                        ])
-                    )
-                    event_context.prevent_default()
+                    else:
+                        # 卡片发送失败，回退到传统方式
+                        raise Exception(f"Music card send failed: {card_result.get('error', 'Unknown')}")
+                except Exception as e:
+                    # 如果卡片发送失败，使用传统方式发送
+                    print(f"音乐卡片发送失败，使用传统方式: {str(e)}")
+                    # 使用音乐下载链接作为在线试听链接
+                    listen_url = link_
+                    # 缩短下载链接
+                    # short_music_url = await shorten_url(music_url)
+                    # short_listen_url = await shorten_url(listen_url)
+                    short_music_url = music_url
+                    short_listen_url = listen_url
+
+                    await self.send_reply(event_context, [
+                        platform_message.Image(url=cover_url),
+                        platform_message.Plain(text=f"歌曲：{song_info.song_name}\n"),
+                        platform_message.Plain(text=f"歌手：{song_info.song_singer}\n"),
+                        platform_message.Plain(text=f"在线试听链接：{short_listen_url}\n"),
+                        platform_message.Plain(text=f"音乐下载链接：{short_music_url}\n"),
+                    ])
+                event_context.prevent_default()
+            else:
+                await self.send_reply(event_context, [
+                    platform_message.Plain(text="无效的选择，请输入正确的序号！"),
+                ])
+                event_context.prevent_default()
+            return
+        
+        # 检查是否包含"点歌"指令
+        if message.startswith("点歌"):
+            # 提取歌曲名称和可选的音质后缀，如“点歌 晴天 无损”
+            song_name, quality = parse_quality_suffix(message[2:].strip())
+            if not song_name:
+                await self.send_reply(event_context, [
+                    platform_message.Plain(text="请输入要点播的歌曲名，格式：点歌+歌曲名"),
+                ])
                 return
             
-            # 检查是否包含"点歌"指令
-            if message.startswith("点歌"):
-                # 提取歌曲名称
-                song_name = message[2:].strip()
-                if not song_name:
-                    await event_context.reply(
-                        platform_message.MessageChain([
-                            platform_message.Plain(text="请输入要点播的歌曲名，格式：点歌+歌曲名"),
-                        ])
-                    )
-                    return
-                
-                # 搜索歌曲
+            # 搜索歌曲
+            try:
                 try:
-                    search_results = await self.search_music(song_name)
-                    
+                    search_results = await self.search_music(song_name, trace=trace, deadline=deadline)
+                    from_cache = False
+                except (UpstreamUnavailable, DeadlineExceeded):
+                    # 上游不可用或超出时间预算时改用本地缓存的结果，并明确告知用户
+                    search_results = await self.search_stale(song_name)
+                    from_cache = True
                     if not search_results:
-                        await event_context.reply(
-                            platform_message.MessageChain([
-                                platform_message.Plain(text=f"未找到歌曲：{song_name}"),
-                            ])
-                        )
+                        await self.send_reply(event_context, [
+                            platform_message.Plain(text="⚠️ 音乐服务暂时不可用，请稍后再试"),
+                        ])
                         event_context.prevent_default()
                         return
-                    
-                    # 保存搜索结果
-                    self.user_searches[user_id] = search_results[:10]  # 最多保存前10首
-                    
-                    # 构建回复消息
-                    reply_text = f"找到以下{min(len(search_results), 10)}首歌曲，请在5秒内回复序号选择：\n"
-                    for i, song in enumerate(search_results[:10]):
-                        reply_text += f"{i+1}. {song['song_name']} - {song['song_singer']}\n"
-                    reply_text += "5秒后将自动取消选择。"
-                    
-                    await event_context.reply(
-                        platform_message.MessageChain([
-                            platform_message.Plain(text=reply_text),
-                        ])
-                    )
+                
+                if not search_results:
+                    await self.send_reply(event_context, [
+                        platform_message.Plain(text=f"未找到歌曲：{song_name}"),
+                    ])
                     event_context.prevent_default()
-                    
-                    # 启动5秒倒计时任务
-                    asyncio.create_task(self.clear_user_search(user_id, 5))
-                    
-                except Exception as e:
-                    await event_context.reply(
-                        platform_message.MessageChain([
-                            platform_message.Plain(text=f"搜索歌曲时出错：{str(e)}"),
-                        ])
-                    )
-    
-    async def search_music(self, song_name):
-        """搜索音乐"""
+                    return
+                
+                # 保存完整搜索结果用于翻页，超时后自动失效
+                session = Session(search_results, quality, 0, from_cache)
+                await self.state_backend.set(session_key, session, ttl=self.selection_timeout)
+                
+                # 构建回复消息
+                reply_text = self._render_search_page(session)
+                
+                await self.send_reply(event_context, [
+                    platform_message.Plain(text=reply_text),
+                ])
+                event_context.prevent_default()
+                
+            except Exception as e:
+                await self.send_reply(event_context, [
+                    platform_message.Plain(text=f"搜索歌曲时出错：{str(e)}"),
+                ])
+
+    async def handle_profile_command(self, event_context: context.EventContext, args):
+        """
+        处理性能分析指令
+
+        性能分析 [条数]：分析接下来的若干条消息（默认100条）
+        性能分析 30秒：分析接下来的30秒
+        性能分析 停止：立即停止并写入结果
+        """
+        args = args.strip()
+        if args == "停止":
+            session = self._profile_session
+            path = session.stop() if session is not None else None
+            reply_text = f"性能分析已停止，结果已写入：{path}" if path else "当前没有进行中的性能分析"
+        elif self._profile_session is not None:
+            reply_text = f"性能分析正在进行中（已记录{self._profile_session.events}条消息）"
+        else:
+            from utils.profiling import parse_profile_args
+            try:
+                max_events, duration = parse_profile_args(args)
+            except ValueError:
+                reply_text = "参数格式不正确，示例：性能分析 100、性能分析 30秒"
+            else:
+                reply_text = self._start_profiling(max_events, duration)
+        await self.send_reply(event_context, [
+            platform_message.Plain(text=reply_text),
+        ])
+
+    def _start_profiling(self, max_events, duration):
+        """开启性能分析，返回回复文本"""
+        from utils.profiling import ProfileSession
+        session = ProfileSession(
+            os.path.join(self.data_dir, 'profiles'),
+            max_events=max_events,
+            duration=duration,
+            on_stop=self._on_profile_stop
+        )
         try:
-            url = "http://lpz.chatc.vip/apiqq.php"
-            params = {
-                'msg': song_name,
-                'type': 'json',
-                'num': '10'
-            }
+            session.start()
+        except ValueError as e:
+            # 已有其他分析工具在运行
+            return f"无法开启性能分析：{str(e)}"
+        self._profile_session = session
+        scope = f"接下来的{max_events}条消息" if max_events else f"接下来的{duration:g}秒"
+        return f"已开启性能分析，将记录{scope}，结果写入 {session.output_dir}"
 
-            # 发送异步请求
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    response.raise_for_status()  # 检查HTTP状态码
-
-                    # 解析JSON
-                    data = await response.json()
-                    # print(f"搜索音乐API响应: {data}")
-                    # 检查状态码和数据格式
-                    if data.get('code') == 200 and isinstance(data.get('data'), list):
-                        # 确保返回的每个元素都有必要的字段
-                        valid_songs = []
-                        for song in data.get('data', []):
-                            if isinstance(song, dict) and all(k in song for k in ['n', 'song_title', 'song_singer']):
-                                # 重命名字段以保持一致性
-                                valid_songs.append({
-                                    'n': song['n'],
-                                    'song_name': song['song_title'],
-                                    'song_singer': song['song_singer']
-                                })
-                        return valid_songs
-                    else:
-                        return []
+    def _on_profile_stop(self, session):
+        """性能分析结束后清除引用，恢复为无开销状态"""
+        if self._profile_session is session:
+            self._profile_session = None
+
+    async def _broadcast_loop(self):
+        """每日定时群发，启动时先继续当天未完成的群发"""
+        from utils.broadcast import seconds_until
+        today = datetime.date.today().isoformat()
+        if os.path.exists(self._broadcast_path(today)):
+            await self._run_broadcast_safely(today)
+        while True:
+            try:
+                delay = seconds_until(self.config.get('broadcast_time'))
+            except ValueError:
+                print(f"群发时间格式不正确（应为 HH:MM）: {self.config.get('broadcast_time')}")
+                return
+            await asyncio.sleep(delay)
+            await self._run_broadcast_safely(datetime.date.today().isoformat())
+
+    async def _run_broadcast_safely(self, job_id):
+        """执行群发，出错时只记录日志，不中断每日群发循环"""
+        try:
+            await self.run_broadcast(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"群发出错: {str(e)}")
+
+    def _broadcast_path(self, job_id):
+        """群发进度文件路径"""
+        return os.path.join(self.data_dir, 'broadcast', f"{job_id}.json")
+
+    async def run_broadcast(self, job_id):
+        """
+        执行（或继续）一次群发：歌曲详情只解析一次，再以有限并发和限速逐群发送音乐卡片
+
+        Args:
+            job_id: 任务标识（日期），同一天的群发只会完成一次
+
+        Returns:
+            BroadcastJob，歌曲解析失败时为None
+        """
+        from utils.broadcast import BroadcastJob
+        groups = [group.strip() for group in str(self.config.get('broadcast_groups', '')).split(',') if group.strip()]
+        songs = [song.strip() for song in str(self.config.get('broadcast_songs', '')).split(',') if song.strip()]
+        job = BroadcastJob(
+            job_id,
+            self._broadcast_path(job_id),
+            groups,
+            concurrency=int(self.config.get('broadcast_concurrency', 4)),
+            interval=int(self.config.get('broadcast_interval_ms', 1500)) / 1000,
+            retry_delay=float(self.config.get('broadcast_retry_delay_s', 30))
+        )
+        if job.load() and job.finished:
+            return job
+
+        # 按日期轮换推荐歌曲，继续未完成的任务时选中的歌曲不变
+        query = songs[datetime.date.fromisoformat(job_id).toordinal() % len(songs)]
+        resolved = await self._resolve_broadcast_song(query)
+        if resolved is None:
+            return None
+        song, detail = resolved
+        job.state['song'] = f"{song.song_name} - {song.song_singer}"
+        audio_url = await self.relay_audio_url(detail.music_url, song.song_name, song.n)
+
+        async def send(group):
+            result = await self.music_card_sender.send_custom_music_card(
+                target_id=int(group),
+                target_type='group',
+                title=f"{song.song_name} - {song.song_singer}",
+                audio_url=audio_url,
+                jump_url=detail.link,
+                image_url=detail.cover,
+                content="musicLink 每日推荐"
+            )
+            # HTTP 成功但 OneBot 返回错误码时同样视为失败
+            data = result.get('data')
+            if result.get('success') and isinstance(data, dict) and data.get('retcode', 0) != 0:
+                error = data.get('message') or data.get('wording') or f"retcode {data['retcode']}"
+                return {'success': False, 'error': error}
+            return result
+
+        await job.run(send, account=self.napcat_http_url)
+        print(job.summary())
+        return job
+
+    async def _resolve_broadcast_song(self, query):
+        """
+        解析群发歌曲的详情，音乐接口暂时失败时在当天内退避重试
+
+        群发属于后台任务：直接以后台优先级请求上游，不与用户的请求争抢名额，
+        不进行音质协商，也不计入搜索热度
+
+        Args:
+            query: 群发歌曲搜索词
+
+        Returns:
+            (歌曲信息, 歌曲详情)，歌曲不存在或重试用尽时为None
+        """
+        attempts = max(1, int(self.config.get('broadcast_retry_attempts', 4)))
+        delay = float(self.config.get('broadcast_retry_delay_s', 30))
+        for attempt in range(1, attempts + 1):
+            try:
+                search_results = await self._fetch_search(query, priority=PRIORITY_BACKGROUND)
+            except Exception as e:
+                error = f"搜索失败: {str(e)}"
+            else:
+                if not search_results:
+                    print(f"群发歌曲未找到: {query}")
+                    return None
+                song = search_results[0]
+                detail = await self._fetch_song_detail(song.song_name, song.n, priority=PRIORITY_BACKGROUND)
+                if detail.music_url:
+                    return song, detail
+                error = "详情获取失败"
+            if attempt < attempts:
+                print(f"群发歌曲解析失败（{error}），{delay:g}秒后重试（{attempt}/{attempts}）: {query}")
+                metrics.incr('broadcast.resolve_retry')
+                await asyncio.sleep(delay)
+                delay *= 2
+        print(f"群发歌曲解析失败（{error}），今日群发取消: {query}")
+        return None
+
+    async def relay_audio_url(self, music_url, song_title, song_n):
+        """启用音频中转时返回指向中转服务的链接，否则返回原链接"""
+        if self.audio_relay is None:
+            return music_url
+        return await self.audio_relay.register(music_url, title=song_title, n=song_n)
+
+    async def _refresh_relay_url(self, meta):
+        """
+        音频中转服务的链接刷新回调：重新获取歌曲详情，优先选择同一文件的新链接并更新详情缓存
+
+        Returns:
+            新的音频链接，获取失败时为None
+        """
+        from utils.audio_relay import audio_key
+
+        info = meta.get('info') or {}
+        if 'title' not in info:
+            return None
+        fallback = None
+        for br in QUALITY_LEVELS.values():
+            detail = await self._fetch_song_detail(info['title'], info.get('n'), br)
+            if not detail.ok or not detail.music_url:
+                continue
+            if audio_key(detail.music_url) == meta['key']:
+                await self.detail_cache.set(f"{info['title']}\x00{info.get('n')}\x00{br}", detail)
+                return detail.music_url
+            fallback = fallback or detail.music_url
+        return fallback
+
+    def _page_count(self, songs):
+        """计算搜索结果的总页数"""
+        return max(1, -(-len(songs) // self.page_size))
+
+    def _render_search_page(self, session):
+        """生成搜索结果当前页的回复文本，序号在全部结果中连续编号"""
+        songs = session.songs
+        page = session.page
+        page_count = self._page_count(songs)
+        start = page * self.page_size
+
+        reply_text = "⚠️ 音乐服务暂时不可用，以下为缓存结果\n" if session.cached else ""
+        reply_text += f"找到{len(songs)}首歌曲"
+        if page_count > 1:
+            reply_text += f"（第{page + 1}/{page_count}页）"
+        reply_text += f"，请在{self.selection_timeout}秒内回复序号选择：\n"
+        for i, song in enumerate(songs[start:start + self.page_size], start + 1):
+            reply_text += f"{i}. {song.song_name} - {song.song_singer}\n"
+        if page_count > 1:
+            reply_text += "回复“下一页”或“上一页”翻页，"
+        reply_text += f"{self.selection_timeout}秒后将自动取消选择。"
+        return reply_text
+
+    @property
+    def music_card_sender(self):
+        """音乐卡片发送器（首次使用时创建）"""
+        if self._music_card_sender is None:
+            from utils.music_card import MusicCardSender
+            self._music_card_sender = MusicCardSender(
+                http_url=self.napcat_http_url,
+                access_token=self.onebot_access_token if self.onebot_access_token else None
+            )
+        return self._music_card_sender
+
+    @property
+    def forward_message_sender(self):
+        """合并转发消息发送器（首次使用时创建）"""
+        if self._forward_message_sender is None:
+            from utils.forward_message import ForwardMessageSender
+            self._forward_message_sender = ForwardMessageSender(
+                http_url=self.napcat_http_url,
+                access_token=self.onebot_access_token if self.onebot_access_token else None
+            )
+        return self._forward_message_sender
+
+    @property
+    def popularity_tracker(self):
+        """热度统计（首次使用时创建，并启动后台缓存预热）"""
+        if self._popularity_tracker is None:
+            from utils.popularity import PopularityTracker, CacheWarmer
+            from utils.rate_limit import WindowRateLimiter
+            self._popularity_tracker = PopularityTracker(top_k=int(self.config.get('warm_top_k', 20)))
+            self.cache_warmer = CacheWarmer(
+                self._popularity_tracker,
+                budget=WindowRateLimiter(
+                    self.state_backend, 'ratelimit:warmer', int(self.config.get('warm_budget_per_minute', 30)), 60
+                )
+            )
+            self.cache_warmer.register('search', self.search_cache, self._load_search_for_cache)
+            self.cache_warmer.register('detail', self.detail_cache, self._load_detail_for_cache)
+            self.cache_warmer.start()
+        return self._popularity_tracker
+
+    @property
+    def quality_negotiator(self):
+        """音质协商器（首次使用时创建）"""
+        if self._quality_negotiator is None:
+            from utils.quality import QualityNegotiator
+            self._quality_negotiator = QualityNegotiator(
+                max_size_mb=float(self.config.get('quality_max_size_mb', 30)),
+                max_first_byte=int(self.config.get('quality_max_first_byte_ms', 1500)) / 1000,
+                prober=self.link_prober
+            )
+        return self._quality_negotiator
+
+    @property
+    def link_prober(self):
+        """链接探测器（首次使用时创建），探测结果缓存在状态存储后端中"""
+        if self._link_prober is None:
+            from utils.link_probe import LinkProber
+            self._link_prober = LinkProber(
+                cache=TTLCache(
+                    ttl=300, max_size=self.cache_max_size, backend=self._cache_backend(), namespace='probe'
+                )
+            )
+        return self._link_prober
+
+    @property
+    def tracer(self):
+        """交互追踪记录器（首次使用时创建）"""
+        if self._tracer is None:
+            from utils.tracing import Tracer
+            self._tracer = Tracer(
+                os.path.join(self.data_dir, 'traces', 'traces.jsonl'),
+                sample_rate=float(self.config.get('trace_sample_rate', 0.05)),
+                slow_threshold_ms=int(self.config.get('trace_slow_threshold_ms', 3000))
+            )
+        return self._tracer
+
+    @property
+    def outbound(self):
+        """出站回复合并缓冲（首次使用时创建）"""
+        if self._outbound is None:
+            from utils.outbound import OutboundCoalescer
+            self._outbound = OutboundCoalescer(window=int(self.config.get('outbound_window_ms', 300)) / 1000)
+            self.outbound_forward_threshold = int(
+                self.config.get('outbound_forward_threshold', self.outbound_forward_threshold)
+            )
+        return self._outbound
+
+    async def send_reply(self, event_context, components):
+        """
+        经由出站合并缓冲回复消息
+
+        同一目标在合并窗口内的多条回复会合并为一条消息，群聊中条数较多时以合并转发发送；
+        合并了不同用户的回复时，每条回复前 @ 对应的用户
+        """
+        event = event_context.event
+        if event.launcher_type == 'group':
+            key = f"group:{event.launcher_id}"
+        else:
+            key = f"private:{event.sender_id}"
+        await self.outbound.submit(
+            key, (event.sender_id, components), lambda items: self._send_coalesced(event_context, items)
+        )
+
+    async def _send_coalesced(self, event_context, items):
+        """发送一个合并窗口内的全部回复，items 为 (发送者ID, 消息组件) 列表"""
+        event = event_context.event
+        if len({sender_id for sender_id, _ in items}) > 1:
+            items = [
+                (sender_id, [platform_message.At(target=sender_id), platform_message.Plain(text=" ")] + components)
+                for sender_id, components in items
+            ]
+        if (
+            len(items) >= self.outbound_forward_threshold
+            and event.launcher_type == 'group'
+            and self.forward_message_sender
+        ):
+            # 每条回复作为一个转发节点
+            messages = [{"content": self._to_onebot_segments(components)} for _, components in items]
+            forward_result = await self.forward_message_sender.send_forward(
+                group_id=int(event.launcher_id),
+                messages=messages,
+                prompt="🎵 musicLink",
+                summary="点歌消息",
+                source="musicLink",
+                nickname="musicLink",
+                mode="multi"
+            )
+            if forward_result.get('success'):
+                return
+
+        # 合并为一条普通消息，各条之间空行分隔
+        merged = []
+        for i, (_, components) in enumerate(items):
+            if i:
+                merged.append(platform_message.Plain(text="\n"))
+            merged.extend(components)
+        await event_context.reply(platform_message.MessageChain(merged))
+
+    @staticmethod
+    def _to_onebot_segments(components):
+        """将消息组件转换为 OneBot 消息段"""
+        segments = []
+        for component in components:
+            if isinstance(component, platform_message.Plain):
+                segments.append({"type": "text", "data": {"text": component.text}})
+            elif isinstance(component, platform_message.Image) and component.url:
+                segments.append({"type": "image", "data": {"file": component.url}})
+            elif isinstance(component, platform_message.At):
+                segments.append({"type": "at", "data": {"qq": str(component.target)}})
+        return segments
+
+    async def search_music(self, song_name, trace=None, deadline=None):
+        """
+        搜索音乐（优先读取缓存）
+
+        上游请求失败（含短期缓存的失败结果）时抛出 UpstreamUnavailable，
+        超出时间预算时抛出 DeadlineExceeded，只有上游确实没有结果时返回空列表
+        """
+        key = normalize_query(song_name)
+        self.popularity_tracker.record_search(key)
+        with span(trace, 'search_music', query=key) as stage:
+            cached = songs_from_raw(await self.search_cache.get(key))
+            if cached is not None:
+                metrics.incr('search_cache.hit')
+                stage.set(cache='hit', count=len(cached))
+                return cached
+
+            # 空结果和失败结果单独缓存较短时间，避免错别字和刷屏反复请求上游
+            negative = await self.negative_cache.get(key)
+            if negative is not None:
+                metrics.incr(f'search_cache.negative_hit.{negative}')
+                stage.set(cache=f'negative_{negative}', count=0)
+                if negative == 'error':
+                    raise UpstreamUnavailable("音乐服务暂时不可用")
+                return []
+            metrics.incr('search_cache.miss')
+
+            try:
+                results = await self._fetch_search(song_name, deadline=deadline)
+            except UpstreamUnavailable:
+                stage.set(cache='miss', degraded=True)
+                raise
+            except Exception as e:
+                print(f"搜索音乐出错: {str(e)}")
+                stage.set(cache='miss', error=str(e))
+                if isinstance(e, DeadlineExceeded) or (deadline is not None and deadline.expired):
+                    # 超出时间预算不代表没有结果，不写入失败缓存
+                    raise DeadlineExceeded(str(e)) from e
+                if not self.upstream_health.degraded:
+                    metrics.incr('search_cache.negative_store.error')
+                    await self.negative_cache.set(key, 'error', ttl=self.negative_error_ttl)
+                # 请求失败不代表没有结果，交由调用方使用缓存结果
+                raise UpstreamUnavailable(str(e)) from e
+
+            stage.set(cache='miss', count=len(results))
+            if results:
+                await self.search_cache.set(key, results)
+            else:
+                metrics.incr('search_cache.negative_store.empty')
+                await self.negative_cache.set(key, 'empty', ttl=self.negative_empty_ttl)
+            return results
+
+    async def search_stale(self, song_name):
+        """
+        降级模式下从本地缓存查找搜索结果
+
+        先查找相同搜索词的缓存（含已过期的长期缓存），
+        再在已知热门搜索词的缓存结果中按歌名和歌手匹配
+        """
+        key = normalize_query(song_name)
+        results = songs_from_raw(await self.search_cache.get(key) or await self.stale_search_cache.get(key))
+        if results:
+            metrics.incr('degraded.search.exact')
+            return results
+
+        tokens = key.split()
+        matched = []
+        seen = set()
+        for known_query, _, _ in self.popularity_tracker.top('search', 1000):
+            for song in songs_from_raw(await self.stale_search_cache.get(known_query)) or []:
+                text = f"{song.song_name} {song.song_singer}".lower()
+                identity = (song.song_name, song.song_singer)
+                if identity not in seen and all(token in text for token in tokens):
+                    seen.add(identity)
+                    matched.append(song)
+        metrics.incr('degraded.search.indexed' if matched else 'degraded.search.miss')
+        return matched[:self.search_fetch_size]
+
+    async def _load_search_for_cache(self, query):
+        """预热任务使用的搜索加载函数，无结果或失败时不写入缓存"""
+        try:
+            results = await self._fetch_search(query, priority=PRIORITY_BACKGROUND)
         except Exception as e:
-            print(f"搜索音乐出错: {str(e)}")
-            return []
+            print(f"预热搜索结果出错: {str(e)}")
+            return None
+        return results or None
+
+    async def _fetch_search(self, song_name, priority=PRIORITY_SEARCH, deadline=None):
+        """请求上游搜索接口，请求失败时抛出异常，降级期间不发送请求"""
+        if not self.upstream_health.allow_request():
+            raise UpstreamUnavailable("音乐服务暂时不可用")
+        try:
+            results = await self._request_search(song_name, priority, deadline)
+        except Exception as e:
+            # 因交互时间预算用完而中断的请求不计为上游失败
+            if not isinstance(e, DeadlineExceeded) and (deadline is None or not deadline.expired):
+                self.upstream_health.record_failure()
+            raise
+        self.upstream_health.record_success()
+        if results:
+            await self.stale_search_cache.set(normalize_query(song_name), results)
+        return results
+
+    async def _keepalive_loop(self):
+        """
+        启动时预热连接，之后定期发送轻量请求，避免空闲连接被关闭
+
+        上游连接成功和失败都计入健康状态，只有连续失败才触发降级；降级期间由健康检查负责探测恢复
+        """
+        await http_pool.warm([self.napcat_http_url, MUSIC_API_URL])
+        while self.keepalive_interval > 0:
+            await asyncio.sleep(self.keepalive_interval)
+            await http_pool.ping(self.napcat_http_url)
+            if self.upstream_health.degraded:
+                continue
+            if await http_pool.ping(MUSIC_API_URL):
+                self.upstream_health.record_success()
+            else:
+                metrics.incr('keepalive.upstream_failed')
+                self.upstream_health.record_failure()
+
+    async def _probe_upstream(self):
+        """降级期间的上游健康检查"""
+        await self._request_search(HEALTH_CHECK_QUERY, PRIORITY_BACKGROUND)
+        return True
+
+    async def _request_search(self, song_name, priority, deadline=None):
+        """发送上游搜索请求，超时时间不超过交互剩余时间"""
+        url = MUSIC_API_URL
+        params = {
+            'msg': song_name,
+            'type': 'json',
+            'num': str(self.search_fetch_size)
+        }
+
+        # 按优先级排队后发送异步请求，排队时间也计入交互时间预算
+        queue_timeout = deadline.remaining() if deadline is not None else None
+        async with self.upstream_scheduler.slot(priority, timeout=queue_timeout):
+            timeout = aiohttp.ClientTimeout(total=stage_timeout(deadline, 10))
+            session = shared_session()
+            async with session.get(url, params=params, timeout=timeout) as response:
+                response.raise_for_status()  # 检查HTTP状态码
+
+                # 解析JSON并按结构校验每首歌曲的必要字段
+                return parse_search_response(await response.read())
     
-    async def get_song_detail(self, song_title, song_n):
-        """获取歌曲详情"""
+    async def resolve_playable_detail(self, search_results, song_index, quality=None, trace=None, deadline=None):
+        """
+        获取所选歌曲的详情并在时间预算内校验链接（不超过交互剩余时间）
+
+        所选歌曲的详情只受交互截止时间限制，校验预算只用于链接探测和备选候选；
+        下载链接失效时依次尝试搜索结果中同名的其他候选，封面失效时清空封面；
+        全部失败时返回所选歌曲的详情
+
+        Returns:
+            (实际使用的歌曲信息, 歌曲详情)
+        """
+        song_info = search_results[song_index]
+        try:
+            detail = await self.resolve_song_detail(
+                song_info.song_name, song_info.n, quality, trace=trace, deadline=deadline
+            )
+        except asyncio.TimeoutError:
+            return song_info, SongDetail(500)
+        if not self.config.get('link_validation', True):
+            return song_info, detail
+
+        budget = int(self.config.get('link_validation_budget_ms', 4000)) / 1000
+        if deadline is not None:
+            budget = min(budget, deadline.remaining())
+        validation = Deadline(budget)
+        title = normalize_query(song_info.song_name)
+        fallbacks = [
+            song for i, song in enumerate(search_results)
+            if i != song_index and normalize_query(song.song_name) == title
+        ]
+
+        first = (song_info, detail)
+        candidate = song_info
+        while True:
+            remaining = validation.remaining()
+            if remaining <= 0:
+                break
+            if detail.music_url:
+                with span(trace, 'link_validation', n=candidate.n) as stage:
+                    music_ok, cover_ok = await self.link_prober.validate(
+                        [detail.music_url, detail.cover],
+                        timeout=min(self.link_prober.timeout, remaining)
+                    )
+                    stage.set(music_ok=music_ok, cover_ok=cover_ok)
+                if music_ok:
+                    if not cover_ok:
+                        detail = detail._replace(cover='')
+                    return candidate, detail
+            if not fallbacks:
+                break
+            metrics.incr('link_validation.fallback')
+
+            candidate = fallbacks.pop(0)
+            remaining = validation.remaining()
+            if remaining <= 0:
+                break
+            try:
+                detail = await asyncio.wait_for(
+                    self.resolve_song_detail(
+                        candidate.song_name, candidate.n, quality, trace=trace, deadline=validation
+                    ),
+                    remaining
+                )
+            except asyncio.TimeoutError:
+                break
+            if not first[1].music_url and detail.music_url:
+                first = (candidate, detail)
+
+        metrics.incr('link_validation.exhausted')
+        return first
+
+    async def resolve_song_detail(self, song_title, song_n, quality=None, trace=None, deadline=None):
+        """获取歌曲详情，未指定音质时在大小和延迟预算内协商音质"""
+        if quality in QUALITY_LEVELS:
+            return await self.get_song_detail(
+                song_title, song_n, QUALITY_LEVELS[quality], trace=trace, deadline=deadline
+            )
+        if not self.config.get('quality_negotiation', True):
+            return await self.get_song_detail(song_title, song_n, trace=trace, deadline=deadline)
+        with span(trace, 'quality_negotiation', n=song_n) as stage:
+            br, detail = await self.quality_negotiator.negotiate(
+                lambda br: self.get_song_detail(song_title, song_n, br, trace=trace, deadline=deadline),
+                deadline=deadline
+            )
+            stage.set(br=br)
+        return detail
+
+    async def get_song_detail(self, song_title, song_n, br=BEST_BITRATE, trace=None, deadline=None):
+        """获取歌曲详情（优先读取缓存，缓存键包含音质）"""
+        key = f"{song_title}\x00{song_n}\x00{br}"
+        self.popularity_tracker.record_detail(key, song_title, song_n, br)
+        with span(trace, 'get_song_detail', n=song_n, br=br) as stage:
+            cached = detail_from_raw(await self.detail_cache.get(key))
+            if cached is not None:
+                metrics.incr('detail_cache.hit')
+                stage.set(cache='hit')
+                return cached
+            metrics.incr('detail_cache.miss')
+
+            detail = await self._fetch_song_detail(song_title, song_n, br, deadline=deadline)
+            stage.set(cache='miss', code=detail.code)
+            if detail.ok:
+                await self.detail_cache.set(key, detail)
+            return detail
+
+    async def _load_detail_for_cache(self, payload):
+        """预热任务使用的详情加载函数，失败时不写入缓存"""
+        song_title, song_n, br = payload
+        detail = await self._fetch_song_detail(song_title, song_n, br, priority=PRIORITY_BACKGROUND)
+        if detail.ok:
+            return detail
+        return None
+
+    async def _fetch_song_detail(self, song_title, song_n, br=BEST_BITRATE, priority=PRIORITY_DETAIL, deadline=None):
+        """请求上游歌曲详情接口，降级期间不发送请求，超时时间不超过交互剩余时间"""
+        if not self.upstream_health.allow_request():
+            return SongDetail(503)
         try:
-            url = "http://lpz.chatc.vip/apiqq.php"
+            url = MUSIC_API_URL
             params = {
                 'msg': song_title,
                 'n': song_n,
                 'type': 'json',
-                'br': '1'  # 使用最高音质
+                'br': br  # 音质，1为最高音质
             }
 
-            # 发送异步请求
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            # 按优先级排队后发送异步请求，排队时间也计入交互时间预算
+            queue_timeout = deadline.remaining() if deadline is not None else None
+            async with self.upstream_scheduler.slot(priority, timeout=queue_timeout):
+                timeout = aiohttp.ClientTimeout(total=stage_timeout(deadline, 10))
+                session = shared_session()
+                async with session.get(url, params=params, timeout=timeout) as response:
                     response.raise_for_status()
-                    return await response.json()
+                    detail = parse_detail_response(await response.read())
+            self.upstream_health.record_success()
+            return detail
         except Exception as e:
             print(f"获取歌曲详情出错: {str(e)}")
+            # 因交互时间预算用完而中断的请求不计为上游失败
+            if not isinstance(e, DeadlineExceeded) and (deadline is None or not deadline.expired):
+                self.upstream_health.record_failure()
             # 返回默认结构，确保即使出错也能继续运行
-            return {'code': 500, 'data': {}}
-
-    
-    async def clear_user_search(self, user_id, delay):
-        """延迟清除用户搜索记录"""
-        await asyncio.sleep(delay)
-        if user_id in self.user_searches:
-            del self.user_searches[user_id]
\ No newline at end of file
+            return SongDetail(500)
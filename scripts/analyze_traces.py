@@ -0,0 +1,133 @@
+"""
+追踪记录分析脚本
+读取插件写入的 traces.jsonl（含滚动的历史文件），输出各阶段耗时统计和最慢的交互明细
+
+用法：
+    python scripts/analyze_traces.py [data/traces/traces.jsonl] [--top 10] [--since 3600]
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+from collections import defaultdict
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'traces', 'traces.jsonl')
+
+
+def load_traces(path, since=None):
+    """读取追踪文件及其滚动副本"""
+    traces = []
+    for file in sorted(glob.glob(f"{path}*")):
+        with open(file, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    trace = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or trace.get('time', 0) >= since:
+                    traces.append(trace)
+    return traces
+
+
+def percentile(values, pct):
+    """计算百分位数"""
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def self_times(spans):
+    """
+    计算各阶段的自身耗时（扣除子阶段覆盖的时间，并发的子阶段只计一次）
+
+    没有父子信息的旧记录按自身耗时等于总耗时处理
+
+    Returns:
+        与 spans 顺序一致的自身耗时列表（毫秒）
+    """
+    children = defaultdict(list)
+    for span in spans:
+        if span.get('parent') is not None:
+            children[span['parent']].append(span)
+    result = []
+    for span in spans:
+        start = span['offset_ms']
+        end = start + span['duration_ms']
+        covered = 0.0
+        cursor = start
+        for child in sorted(children.get(span.get('id'), []), key=lambda s: s['offset_ms']):
+            child_start = max(child['offset_ms'], cursor)
+            child_end = min(child['offset_ms'] + child['duration_ms'], end)
+            if child_end > child_start:
+                covered += child_end - child_start
+                cursor = child_end
+        result.append(max(0.0, span['duration_ms'] - covered))
+    return result
+
+
+def print_stage_summary(traces):
+    """输出各阶段耗时分布（总计按自身耗时统计，嵌套的子阶段不重复计入）"""
+    durations = defaultdict(list)
+    own = defaultdict(float)
+    for trace in traces:
+        durations['(total)'].append(trace['duration_ms'])
+        own['(total)'] += trace['duration_ms']
+        spans = trace.get('spans', [])
+        for span, self_ms in zip(spans, self_times(spans)):
+            durations[span['name']].append(span['duration_ms'])
+            own[span['name']] += self_ms
+
+    print(f"{'阶段':<26}{'次数':>8}{'p50(ms)':>12}{'p95(ms)':>12}{'max(ms)':>12}{'自身总计(ms)':>14}")
+    for name, values in sorted(durations.items(), key=lambda item: -own[item[0]]):
+        values.sort()
+        print(
+            f"{name:<26}{len(values):>8}{percentile(values, 50):>12.1f}"
+            f"{percentile(values, 95):>12.1f}{values[-1]:>12.1f}{own[name]:>14.1f}"
+        )
+
+
+def print_slowest(traces, top):
+    """输出最慢交互的阶段明细"""
+    print(f"\n最慢的 {top} 次交互：")
+    for trace in sorted(traces, key=lambda t: -t['duration_ms'])[:top]:
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(trace.get('time', 0)))
+        spans = trace.get('spans', [])
+        rows = sorted(zip(spans, self_times(spans)), key=lambda row: (row[0]['offset_ms'], row[0].get('depth', 0)))
+        slowest = max(rows, key=lambda row: row[1])[0]['name'] if rows else '-'
+        print(f"\n[{trace['trace_id']}] {when} 共 {trace['duration_ms']:.1f} ms，最慢阶段（自身耗时）: {slowest}")
+        for span, self_ms in rows:
+            error = f"  ❌ {span['error']}" if span.get('error') else ''
+            attrs = ' '.join(f"{k}={v}" for k, v in span.get('attrs', {}).items())
+            name = '  ' * span.get('depth', 0) + span['name']
+            print(
+                f"  +{span['offset_ms']:>8.1f}ms {name:<24}{span['duration_ms']:>9.1f} ms"
+                f"（自身 {self_ms:.1f}）  {attrs}{error}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    parser.add_argument('--top', type=int, default=10, help='输出最慢交互的数量')
+    parser.add_argument('--since', type=float, default=None, help='只分析最近多少秒内的记录')
+    args = parser.parse_args()
+
+    since = time.time() - args.since if args.since else None
+    traces = load_traces(args.path, since)
+    if not traces:
+        print(f"没有找到追踪记录: {args.path}")
+        return
+
+    print(f"共 {len(traces)} 条追踪记录\n")
+    print_stage_summary(traces)
+    print_slowest(traces, args.top)
+
+
+if __name__ == '__main__':
+    main()
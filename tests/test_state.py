@@ -0,0 +1,103 @@
+"""
+状态存储后端测试
+RedisStateBackend 连接 MiniRedisServer 替身服务运行，无需安装 Redis
+"""
+
+import asyncio
+
+import pytest
+
+from utils.records import Session, SongDetail, detail_from_raw, make_song, session_from_raw
+from utils.resp_server import MiniRedisServer
+from utils.state import MemoryStateBackend, RedisStateBackend
+
+
+def run_with_redis(test, clients=1):
+    """启动替身服务并创建若干个后端实例运行测试，结束后关闭连接和服务"""
+    async def main():
+        server = MiniRedisServer()
+        await server.start()
+        backends = [RedisStateBackend(server.url) for _ in range(clients)]
+        try:
+            await test(*backends)
+        finally:
+            for backend in backends:
+                await backend.close()
+            await server.stop()
+    asyncio.run(main())
+
+
+def run_with_backend(kind, test):
+    """在指定类型的后端上运行测试"""
+    if kind == 'redis':
+        run_with_redis(test)
+    else:
+        asyncio.run(test(MemoryStateBackend()))
+
+
+def test_getdel_claims_session_once():
+    async def test(first, second):
+        await first.set('session:1', {'songs': []}, ttl=5)
+        claims = await asyncio.gather(*(
+            backend.getdel('session:1') for backend in (first, second, first, second)
+        ))
+        assert [claim for claim in claims if claim is not None] == [{'songs': []}]
+        assert await second.get('session:1') is None
+    run_with_redis(test, clients=2)
+
+
+@pytest.mark.parametrize('kind', ['memory', 'redis'])
+def test_set_if_absent(kind):
+    async def test(backend):
+        assert await backend.set_if_absent('dedup:a', 1, ttl=0.05)
+        assert not await backend.set_if_absent('dedup:a', 1, ttl=0.05)
+        assert await backend.ttl('dedup:a') > 0
+        await asyncio.sleep(0.08)
+        assert await backend.set_if_absent('dedup:a', 1, ttl=0.05)
+        assert await backend.set_if_absent('dedup:b', 1)
+        assert await backend.ttl('dedup:b') == float('inf')
+    run_with_backend(kind, test)
+
+
+def test_set_if_absent_is_atomic_across_clients():
+    async def test(*backends):
+        results = await asyncio.gather(*(
+            backend.set_if_absent('dedup:msg', 1, ttl=5) for backend in backends
+        ))
+        assert results.count(True) == 1
+    run_with_redis(test, clients=4)
+
+
+@pytest.mark.parametrize('kind', ['memory', 'redis'])
+def test_incr_sets_ttl_on_create_only(kind):
+    async def test(backend):
+        assert await backend.incr('ratelimit:x', ttl=0.2) == 1
+        first_ttl = await backend.ttl('ratelimit:x')
+        assert 0 < first_ttl <= 0.2
+        await asyncio.sleep(0.05)
+        assert await backend.incr('ratelimit:x', 2, ttl=0.2) == 3
+        # 后续增加不重置过期时间
+        assert await backend.ttl('ratelimit:x') < first_ttl
+        await asyncio.sleep(0.2)
+        assert await backend.ttl('ratelimit:x') == -1
+        assert await backend.incr('ratelimit:x', ttl=0.2) == 1
+    run_with_backend(kind, test)
+
+
+@pytest.mark.parametrize('kind', ['memory', 'redis'])
+def test_records_round_trip(kind):
+    songs = [make_song(1, '晴天', '周杰伦'), make_song(2, '晴天', '孙燕姿')]
+    session = Session(songs, '无损', 1, True)
+    detail = SongDetail(200, 'http://c/1.jpg', 'http://m/1.mp3', 'http://l/1')
+
+    async def test(backend):
+        await backend.set('session:1', session, ttl=5)
+        await backend.set('detail:1', detail, ttl=5)
+        restored = session_from_raw(await backend.get('session:1'))
+        assert restored == session
+        assert isinstance(restored, Session)
+        assert all(type(song) is type(songs[0]) for song in restored.songs)
+        restored_detail = detail_from_raw(await backend.get('detail:1'))
+        assert restored_detail == detail
+        assert isinstance(restored_detail, SongDetail) and restored_detail.ok
+    run_with_backend(kind, test)
@@ -1,22 +1,35 @@
 """
 DataCardPlugin Utils Module
 Provides utility functions for music cards and forward messages
+
+子模块在首次访问对应名称时才导入，避免插件启动时加载用不到的功能
 """
 
-from .music_card import MusicCardSender, send_music_card
-from .forward_message import (
-    ForwardMessageSender,
-    send_forward_message,
-    convert_message_to_forward
-)
+import importlib
 
-__all__ = [
+# 导出名称 -> 所在子模块
+_LAZY_EXPORTS = {
     # Music card
-    'MusicCardSender',
-    'send_music_card',
+    'MusicCardSender': '.music_card',
+    'send_music_card': '.music_card',
 
     # Forward message
-    'ForwardMessageSender',
-    'send_forward_message',
-    'convert_message_to_forward',
-]
+    'ForwardMessageSender': '.forward_message',
+    'send_forward_message': '.forward_message',
+    'convert_message_to_forward': '.forward_message',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
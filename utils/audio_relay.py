@@ -0,0 +1,356 @@
+"""
+音频中转服务模块
+内嵌的 aiohttp HTTP 服务，音乐卡片的音频链接指向本服务：
+首次播放时边从上游下载边转发给客户端，同时写入磁盘缓存；
+之后的播放直接由磁盘文件响应（sendfile，支持 Range）；
+上游签名链接过期时通过回调获取新链接后重试
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+from .codec import dumps, loads
+from .metrics import metrics
+
+
+# 转发和写入缓存的分块大小
+CHUNK_SIZE = 64 * 1024
+# 上游返回这些状态码时视为链接过期，刷新链接后重试
+EXPIRED_STATUSES = frozenset((401, 403, 404, 410))
+# 中转服务独立连接池的连接数上限（播放是长连接，不占用共享连接池）
+UPSTREAM_CONNECTION_LIMIT = 32
+# 转发给客户端的上游响应头
+FORWARD_HEADERS = ('Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges', 'Last-Modified', 'ETag')
+
+
+def _is_open_range_from_start(range_header: str) -> bool:
+    """Range 请求头是否为从头开始且不限结尾（bytes=0-）"""
+    return range_header.replace(' ', '').lower() == 'bytes=0-'
+
+
+def _touch(path: str) -> bool:
+    """缓存文件存在时更新其访问时间（用于淘汰），返回是否存在"""
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def audio_key(url: str) -> str:
+    """
+    计算音频缓存键：同一文件的签名链接只有查询参数不同，因此只使用主机和路径
+
+    Args:
+        url: 上游音频链接
+
+    Returns:
+        缓存键
+    """
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+class AudioRelay:
+    """带磁盘缓存的音频中转服务"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        public_url: str,
+        host: str = "0.0.0.0",
+        port: int = 18080,
+        max_cache_bytes: int = 1024 * 1024 * 1024,
+        refresh: Optional[Callable[[Dict[str, Any]], Awaitable[Optional[str]]]] = None
+    ):
+        """
+        初始化中转服务
+
+        Args:
+            cache_dir: 磁盘缓存目录
+            public_url: 客户端访问本服务使用的地址（监听地址通常是 0.0.0.0，客户端无法直接访问）
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            max_cache_bytes: 磁盘缓存大小上限（字节），超出时删除最久未播放的文件
+            refresh: 链接过期时获取新链接的函数，参数为注册时保存的元数据
+
+        Raises:
+            ValueError: 未提供 public_url
+        """
+        if not public_url:
+            raise ValueError("音频中转服务需要配置客户端可访问的 public_url")
+        self.cache_dir = cache_dir
+        self.host = host
+        self.port = port
+        self.public_url = public_url.rstrip('/')
+        self.max_cache_bytes = max_cache_bytes
+        self.refresh = refresh
+        self._runner: Optional[web.AppRunner] = None
+        # 请求上游音频使用的独立会话，避免长时间的播放占满共享连接池
+        self._session: Optional[aiohttp.ClientSession] = None
+        # 正在写入缓存的音频，同一音频只由一个请求写入
+        self._filling = set()
+        # 后台下载完整文件的任务
+        self._fill_tasks = set()
+
+    @property
+    def base_url(self) -> str:
+        """客户端访问本服务的地址"""
+        return self.public_url
+
+    async def start(self):
+        """启动服务"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=UPSTREAM_CONNECTION_LIMIT, ttl_dns_cache=300)
+        )
+        app = web.Application()
+        app.router.add_get('/audio/{token}', self._handle_audio)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        if not self.port:
+            self.port = self._runner.addresses[0][1]
+        print(f"音频中转服务已启动: {self.host}:{self.port}，客户端地址 {self.base_url}")
+
+    async def stop(self):
+        """停止服务"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        for task in list(self._fill_tasks):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _meta_path(self, token: str) -> str:
+        return os.path.join(self.cache_dir, f"{token}.json")
+
+    def _load_meta(self, token: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path(token), 'rb') as f:
+                return loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, token: str, meta: Dict[str, Any]):
+        tmp_path = f"{self._meta_path(token)}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps(meta))
+        os.replace(tmp_path, self._meta_path(token))
+
+    def _audio_path(self, token: str, meta: Dict[str, Any]) -> str:
+        return os.path.join(self.cache_dir, f"{token}{meta.get('ext', '')}")
+
+    async def register(self, url: str, **info) -> str:
+        """
+        登记上游音频链接，返回指向本服务的链接
+
+        Args:
+            url: 上游音频链接
+            info: 刷新链接时需要的信息（如歌名、序号），原样传给 refresh
+
+        Returns:
+            中转链接，url 不是 HTTP 链接时原样返回
+        """
+        if not url or not url.startswith(('http://', 'https://')):
+            return url
+        key = audio_key(url)
+        token = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+        ext = os.path.splitext(urlsplit(url).path)[1][:8]
+        meta = {'url': url, 'key': key, 'ext': ext, 'info': info}
+        if await asyncio.to_thread(self._load_meta, token) != meta:
+            await asyncio.to_thread(self._save_meta, token, meta)
+        return f"{self.base_url}/audio/{token}{ext}"
+
+    async def _handle_audio(self, request: web.Request) -> web.StreamResponse:
+        """处理音频请求：命中磁盘缓存时直接发送文件，否则从上游中转"""
+        token = os.path.splitext(request.match_info['token'])[0]
+        meta = await asyncio.to_thread(self._load_meta, token)
+        if meta is None:
+            raise web.HTTPNotFound()
+
+        path = self._audio_path(token, meta)
+        if await asyncio.to_thread(_touch, path):
+            metrics.incr('relay.disk_hit')
+            # FileResponse 使用 sendfile 发送并处理 Range/If-Range 请求
+            return web.FileResponse(path, headers={'Content-Type': self._content_type(meta)})
+
+        metrics.incr('relay.upstream')
+        return await self._relay(request, token, meta)
+
+    def _content_type(self, meta: Dict[str, Any]) -> str:
+        return meta.get('content_type') or mimetypes.guess_type(f"audio{meta.get('ext', '')}")[0] or 'audio/mpeg'
+
+    async def _open_upstream(
+        self, method: str, token: str, meta: Dict[str, Any], headers: Dict[str, str]
+    ) -> aiohttp.ClientResponse:
+        """请求上游，链接过期时刷新后重试一次"""
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+        session = self._session
+        upstream = await session.request(method, meta['url'], headers=headers, timeout=timeout)
+        if upstream.status in EXPIRED_STATUSES and self.refresh is not None:
+            upstream.release()
+            new_url = await self.refresh(meta)
+            if new_url and new_url != meta['url']:
+                metrics.incr('relay.refreshed')
+                meta['url'] = new_url
+                await asyncio.to_thread(self._save_meta, token, meta)
+            upstream = await session.request(method, meta['url'], headers=headers, timeout=timeout)
+        return upstream
+
+    async def _relay(self, request: web.Request, token: str, meta: Dict[str, Any]) -> web.StreamResponse:
+        """
+        从上游中转，完整请求时同时写入磁盘缓存
+
+        播放器通常以 Range: bytes=0- 开始播放，这种请求向上游获取完整文件并写入缓存；
+        其他 Range 请求只转发，同时在后台下载完整文件
+        """
+        range_header = request.headers.get('Range')
+        from_start = range_header is None or _is_open_range_from_start(range_header)
+        headers = {} if from_start else {'Range': range_header}
+        try:
+            upstream = await self._open_upstream(request.method, token, meta, headers)
+        except Exception as e:
+            print(f"音频中转请求上游失败: {str(e)}")
+            raise web.HTTPBadGateway()
+
+        try:
+            if upstream.status >= 400:
+                metrics.incr('relay.upstream_error')
+                raise web.HTTPBadGateway(text=f"upstream HTTP {upstream.status}")
+
+            response = web.StreamResponse(status=upstream.status)
+            for name in FORWARD_HEADERS:
+                if name in upstream.headers:
+                    response.headers[name] = upstream.headers[name]
+            response.headers.setdefault('Accept-Ranges', 'bytes')
+            if range_header is not None and upstream.status == 200 and upstream.content_length:
+                # 客户端请求 bytes=0-，以完整内容回复 206
+                response.set_status(206)
+                response.headers['Content-Range'] = f"bytes 0-{upstream.content_length - 1}/{upstream.content_length}"
+            await response.prepare(request)
+            if request.method == 'HEAD':
+                return response
+
+            cache = None
+            if upstream.status == 200 and token not in self._filling:
+                cache = await _CacheFile.open(self, token, meta)
+            elif token not in self._filling:
+                self._start_fill(token, meta)
+            complete = False
+            try:
+                # 上游分块原样转发给客户端并写入缓存，不做拼接
+                async for chunk in upstream.content.iter_chunked(CHUNK_SIZE):
+                    await response.write(chunk)
+                    if cache is not None:
+                        await cache.write(chunk)
+                await response.write_eof()
+                complete = True
+            finally:
+                if cache is not None:
+                    await cache.finish(complete, upstream)
+            return response
+        finally:
+            upstream.release()
+
+    def _start_fill(self, token: str, meta: Dict[str, Any]):
+        """在后台下载完整文件写入缓存"""
+        task = asyncio.create_task(self._fill(token, meta))
+        self._fill_tasks.add(task)
+        task.add_done_callback(self._fill_tasks.discard)
+
+    async def _fill(self, token: str, meta: Dict[str, Any]):
+        """下载完整文件写入缓存（不转发给客户端）"""
+        try:
+            upstream = await self._open_upstream('GET', token, meta, {})
+        except Exception as e:
+            print(f"音频缓存下载失败: {str(e)}")
+            return
+        try:
+            if upstream.status != 200 or token in self._filling:
+                return
+            metrics.incr('relay.background_fill')
+            cache = await _CacheFile.open(self, token, meta)
+            complete = False
+            try:
+                async for chunk in upstream.content.iter_chunked(CHUNK_SIZE):
+                    await cache.write(chunk)
+                complete = True
+            finally:
+                await cache.finish(complete, upstream)
+        except Exception as e:
+            print(f"音频缓存下载失败: {str(e)}")
+        finally:
+            upstream.release()
+
+    def _evict(self):
+        """磁盘缓存超出上限时，删除最久未播放的音频文件"""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(('.json', '.part', '.tmp')):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        entries.sort()
+        while total > self.max_cache_bytes and entries:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            metrics.incr('relay.evicted')
+
+
+class _CacheFile:
+    """正在写入的缓存文件，文件操作在线程中执行，不阻塞事件循环"""
+
+    def __init__(self, relay: AudioRelay, token: str, meta: Dict[str, Any], path: str, file):
+        self.relay = relay
+        self.token = token
+        self.meta = meta
+        self.path = path
+        self.file = file
+        self.written = 0
+
+    @classmethod
+    async def open(cls, relay: AudioRelay, token: str, meta: Dict[str, Any]) -> "_CacheFile":
+        relay._filling.add(token)
+        path = relay._audio_path(token, meta)
+        try:
+            file = await asyncio.to_thread(open, f"{path}.part", 'wb')
+        except BaseException:
+            relay._filling.discard(token)
+            raise
+        return cls(relay, token, meta, path, file)
+
+    async def write(self, chunk: bytes):
+        await asyncio.to_thread(self.file.write, chunk)
+        self.written += len(chunk)
+
+    async def finish(self, complete: bool, upstream: aiohttp.ClientResponse):
+        """完整下载时替换为正式缓存文件并淘汰旧文件，否则删除临时文件"""
+        try:
+            await asyncio.to_thread(self.file.close)
+            expected = upstream.content_length
+            if complete and (expected is None or expected == self.written):
+                await asyncio.to_thread(os.replace, f"{self.path}.part", self.path)
+                self.meta['content_type'] = upstream.headers.get('Content-Type')
+                await asyncio.to_thread(self.relay._save_meta, self.token, self.meta)
+                metrics.incr('relay.cached')
+                await asyncio.to_thread(self.relay._evict)
+            else:
+                await asyncio.to_thread(os.remove, f"{self.path}.part")
+        finally:
+            self.relay._filling.discard(self.token)
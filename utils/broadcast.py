@@ -0,0 +1,205 @@
+"""
+定时群发模块
+每日在指定时间向多个群推送歌曲：每首歌只解析一次详情，
+再以有限并发和按机器人账号限速的方式逐群发送；
+发送进度写入数据目录，重启后可继续未完成的推送，并记录每个群的发送结果
+"""
+
+import asyncio
+import datetime
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .codec import dumps, loads
+from .metrics import metrics
+
+
+# 每个群的最多发送次数（含恢复后的重试）
+MAX_ATTEMPTS = 3
+
+
+def seconds_until(at: str, now: Optional[datetime.datetime] = None) -> float:
+    """
+    计算距离下一次每日定时的秒数
+
+    Args:
+        at: 每日时间，格式 'HH:MM'
+        now: 当前时间，默认为本地当前时间
+
+    Returns:
+        秒数
+
+    Raises:
+        ValueError: 时间格式不正确
+    """
+    now = now or datetime.datetime.now()
+    hour, minute = (int(part) for part in at.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class Pacer:
+    """按固定间隔放行发送请求，用于限制单个机器人账号的发送速率"""
+
+    def __init__(self, interval: float):
+        """
+        初始化限速器
+
+        Args:
+            interval: 相邻两次发送的最小间隔（秒）
+        """
+        self.interval = interval
+        self._next_at = 0.0
+
+    async def wait(self):
+        """等待到下一个可发送的时间点"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        at = max(now, self._next_at)
+        self._next_at = at + self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+class BroadcastJob:
+    """一次群发任务，进度保存在 JSON 文件中"""
+
+    def __init__(
+        self,
+        job_id: str,
+        path: str,
+        groups: List[str],
+        concurrency: int = 4,
+        interval: float = 1.5,
+        retry_delay: float = 30.0
+    ):
+        """
+        初始化群发任务
+
+        Args:
+            job_id: 任务标识（如日期），同一标识的任务只会完成一次
+            path: 进度文件路径
+            groups: 目标群号列表
+            concurrency: 同时发送的请求数上限
+            interval: 同一机器人账号相邻两次发送的最小间隔（秒）
+            retry_delay: 发送失败的群首次重试前的等待时间（秒），之后每轮翻倍
+        """
+        self.job_id = job_id
+        self.path = path
+        self.groups = groups
+        self.concurrency = max(1, concurrency)
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.state: Dict[str, Any] = {'job_id': job_id, 'finished': False, 'results': {}}
+        self._pacers: Dict[str, Pacer] = {}
+
+    def load(self) -> bool:
+        """
+        读取已保存的进度
+
+        Returns:
+            是否存在该任务的进度
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                state = loads(f.read())
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"读取群发进度失败: {str(e)}")
+            return False
+        if not isinstance(state, dict) or state.get('job_id') != self.job_id:
+            return False
+        self.state = state
+        return True
+
+    def save(self):
+        """写入进度（先写临时文件再替换，避免中途退出导致文件损坏）"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps(self.state))
+        os.replace(tmp_path, self.path)
+
+    @property
+    def finished(self) -> bool:
+        """任务是否已完成"""
+        return bool(self.state.get('finished'))
+
+    def pending_groups(self) -> List[str]:
+        """尚未发送成功且未超过重试次数的群"""
+        results = self.state['results']
+        return [
+            group for group in self.groups
+            if results.get(group, {}).get('status') != 'ok'
+            and results.get(group, {}).get('attempts', 0) < MAX_ATTEMPTS
+        ]
+
+    def _pacer(self, account: str) -> Pacer:
+        pacer = self._pacers.get(account)
+        if pacer is None:
+            pacer = self._pacers[account] = Pacer(self.interval)
+        return pacer
+
+    async def run(
+        self,
+        send: Callable[[str], Awaitable[Dict[str, Any]]],
+        account: str = "default"
+    ) -> Dict[str, Any]:
+        """
+        向尚未成功的群发送，每个群发送完成后立即保存进度；
+        失败的群按退避间隔重试，直到成功或达到最多发送次数
+
+        Args:
+            send: 向指定群发送的函数，返回包含 success/error 的结果
+            account: 发送所用的机器人账号，同一账号的发送按间隔限速
+
+        Returns:
+            每个群的发送结果
+        """
+        results = self.state['results']
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pacer = self._pacer(account)
+
+        async def _send_one(group: str):
+            async with semaphore:
+                await pacer.wait()
+                try:
+                    result = await send(group)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+            entry = results.setdefault(group, {'attempts': 0})
+            entry['attempts'] = entry.get('attempts', 0) + 1
+            entry['status'] = 'ok' if result.get('success') else 'failed'
+            entry['error'] = None if result.get('success') else result.get('error', 'Unknown')
+            entry['time'] = datetime.datetime.now().isoformat(timespec='seconds')
+            metrics.incr(f"broadcast.{entry['status']}")
+            self.save()
+
+        delay = self.retry_delay
+        pending = self.pending_groups()
+        while True:
+            await asyncio.gather(*(_send_one(group) for group in pending))
+            pending = self.pending_groups()
+            if not pending:
+                break
+            metrics.incr('broadcast.retry_round')
+            await asyncio.sleep(delay)
+            delay *= 2
+        self.state['finished'] = True
+        self.save()
+        return results
+
+    def summary(self) -> str:
+        """生成发送结果摘要"""
+        results = self.state['results']
+        ok = sum(1 for group in self.groups if results.get(group, {}).get('status') == 'ok')
+        failed = [group for group in self.groups if results.get(group, {}).get('status') == 'failed']
+        text = f"群发任务 {self.job_id}：成功 {ok}/{len(self.groups)}"
+        if failed:
+            text += "，失败：" + ", ".join(f"{group}（{results[group].get('error')}）" for group in failed)
+        return text
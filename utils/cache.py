@@ -0,0 +1,79 @@
+"""
+缓存模块
+提供带过期时间的异步缓存，数据存放在可替换的状态存储后端中
+"""
+
+from typing import Any, Optional
+
+from .state import MemoryStateBackend, StateBackend
+
+
+class TTLCache:
+    """带过期时间的缓存"""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int = 1024,
+        backend: Optional[StateBackend] = None,
+        namespace: str = "cache"
+    ):
+        """
+        初始化缓存
+
+        Args:
+            ttl: 默认过期时间（秒）
+            max_size: 未指定后端时，进程内存储的最大条目数
+            backend: 状态存储后端，默认为独立的进程内存储
+            namespace: 键命名空间，多个缓存共享同一后端时用于区分
+        """
+        self.ttl = ttl
+        self.backend = backend or MemoryStateBackend(max_keys=max_size)
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，不存在或已过期时返回None
+        """
+        return await self.backend.get(self._key(key))
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 过期时间（秒），默认使用初始化时的ttl
+        """
+        await self.backend.set(self._key(key), value, self.ttl if ttl is None else ttl)
+
+    async def delete(self, key: str):
+        """
+        删除缓存
+
+        Args:
+            key: 缓存键
+        """
+        await self.backend.delete(self._key(key))
+
+    async def ttl_remaining(self, key: str) -> float:
+        """
+        获取缓存剩余有效时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            剩余秒数，不存在或已过期时返回-1
+        """
+        return await self.backend.ttl(self._key(key))
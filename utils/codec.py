@@ -0,0 +1,173 @@
+"""
+JSON 编解码模块
+优先使用 orjson 或 msgspec（若已安装），否则回退到标准库 json，
+并提供上游接口响应的结构化解析
+"""
+
+import json
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Union
+
+from .records import Song, SongDetail, detail_from_payload, make_song
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - 可选依赖
+    msgspec = None
+
+
+Codec = namedtuple('Codec', ['name', 'dumps', 'loads'])
+
+
+def _std_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+_CODECS: Dict[str, Codec] = {
+    'json': Codec('json', _std_dumps, json.loads),
+}
+if msgspec is not None:
+    _CODECS['msgspec'] = Codec('msgspec', msgspec.json.encode, msgspec.json.decode)
+if orjson is not None:
+    def _orjson_default(obj: Any) -> Any:
+        # orjson 不直接支持 namedtuple 记录，按数组序列化（与 json/msgspec 一致）
+        if isinstance(obj, tuple):
+            return list(obj)
+        raise TypeError
+
+    def _orjson_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_orjson_default)
+
+    _CODECS['orjson'] = Codec('orjson', _orjson_dumps, orjson.loads)
+
+# 按优先级选择默认编解码器
+_active: Codec = _CODECS.get('orjson') or _CODECS.get('msgspec') or _CODECS['json']
+
+
+def available_codecs() -> List[str]:
+    """
+    获取当前环境可用的编解码器名称
+
+    Returns:
+        名称列表
+    """
+    return list(_CODECS)
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """
+    获取编解码器
+
+    Args:
+        name: 编解码器名称（'orjson'/'msgspec'/'json'），默认为当前使用的编解码器
+
+    Returns:
+        Codec 对象
+    """
+    if name is None:
+        return _active
+    if name not in _CODECS:
+        raise ValueError(f"编解码器不可用: {name}")
+    return _CODECS[name]
+
+
+def dumps(obj: Any) -> bytes:
+    """将对象序列化为 UTF-8 JSON 字节串"""
+    return _active.dumps(obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """将 JSON 字节串或字符串反序列化为对象"""
+    return _active.loads(data)
+
+
+def decode_body(body: bytes) -> Any:
+    """
+    解析HTTP响应体，空响应体返回None（与 aiohttp 的 response.json() 一致）
+
+    Args:
+        body: 响应体
+
+    Returns:
+        解析后的对象
+    """
+    if not body.strip():
+        return None
+    return _active.loads(body)
+
+
+# 上游搜索结果中每首歌必须包含的字段
+_SEARCH_FIELDS = frozenset(('n', 'song_title', 'song_singer'))
+
+if msgspec is not None:
+    class _SongRecord(msgspec.Struct):
+        """上游搜索结果中的单首歌曲"""
+        n: Union[int, str]
+        song_title: str
+        song_singer: str
+
+    class _SearchResponse(msgspec.Struct):
+        """上游搜索接口响应"""
+        code: Any = None
+        data: List[_SongRecord] = []
+
+    _search_decoder = msgspec.json.Decoder(_SearchResponse)
+
+
+def _lenient_search(payload: Any) -> List[Song]:
+    """逐条过滤不完整记录的搜索结果解析"""
+    if not isinstance(payload, dict) or payload.get('code') != 200:
+        return []
+    data = payload.get('data')
+    if not isinstance(data, list):
+        return []
+    return [
+        make_song(song['n'], song['song_title'], song['song_singer'])
+        for song in data
+        if isinstance(song, dict) and _SEARCH_FIELDS <= song.keys()
+    ]
+
+
+def parse_search_response(raw: Union[bytes, str]) -> List[Song]:
+    """
+    解析上游搜索接口响应
+
+    安装了 msgspec 时按类型结构一次性解码并校验；
+    若存在不完整记录则回退为逐条过滤，行为与严格解析一致
+
+    Args:
+        raw: 响应体
+
+    Returns:
+        Song 记录列表
+    """
+    if msgspec is not None:
+        try:
+            response = _search_decoder.decode(raw)
+        except msgspec.ValidationError:
+            return _lenient_search(loads(raw))
+        if response.code != 200:
+            return []
+        return [
+            make_song(song.n, song.song_title, song.song_singer)
+            for song in response.data
+        ]
+    return _lenient_search(loads(raw))
+
+
+def parse_detail_response(raw: Union[bytes, str]) -> SongDetail:
+    """
+    解析上游歌曲详情接口响应
+
+    Args:
+        raw: 响应体
+
+    Returns:
+        SongDetail 记录，响应格式不正确时 code 为500
+    """
+    return detail_from_payload(loads(raw))
@@ -0,0 +1,75 @@
+"""
+交互截止时间模块
+每次消息处理创建一个截止时间并传递给各个阶段，
+每个阶段只使用剩余的时间预算，而不是各自固定的超时时间
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """交互的时间预算已用完"""
+
+
+class Deadline:
+    """一次交互的截止时间"""
+
+    __slots__ = ('budget', 'expires_at')
+
+    def __init__(self, budget: float):
+        """
+        初始化截止时间
+
+        Args:
+            budget: 时间预算（秒）
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """剩余时间（秒），已超时时为0"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """是否已超时"""
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """
+        获取当前阶段可用的超时时间
+
+        Args:
+            cap: 阶段自身的超时上限（秒）
+
+        Returns:
+            剩余时间与上限中较小的一个
+
+        Raises:
+            DeadlineExceeded: 已超时
+        """
+        remaining = self.expires_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"超出交互时间预算（{self.budget:g}秒）")
+        return remaining if cap is None else min(cap, remaining)
+
+
+def stage_timeout(deadline: Optional[Deadline], cap: float) -> float:
+    """
+    在可选的截止时间下计算阶段超时时间，未传入截止时间时使用阶段自身的上限
+
+    Args:
+        deadline: 截止时间或None
+        cap: 阶段自身的超时上限（秒）
+
+    Returns:
+        超时时间（秒），始终大于0
+
+    Raises:
+        DeadlineExceeded: 已超时
+    """
+    if deadline is None:
+        return cap
+    return deadline.timeout(cap)
@@ -0,0 +1,86 @@
+"""
+消息去重模块
+在有限容量和时间窗口内记录已处理的消息，过滤重连时重复投递的消息
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class DedupCache:
+    """有容量上限的时间窗口去重缓存"""
+
+    def __init__(self, window: float = 60.0, max_size: int = 4096):
+        """
+        初始化去重缓存
+
+        Args:
+            window: 去重时间窗口（秒）
+            max_size: 最多记录的消息数，超出时淘汰最早的记录
+        """
+        self.window = window
+        self.max_size = max_size
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def _evict(self, now: float):
+        """清理过期和超出容量的记录"""
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if seen_at > now - self.window and len(self._seen) < self.max_size:
+                break
+            del self._seen[key]
+
+    def check_and_add(self, key: str) -> bool:
+        """
+        检查消息是否重复，未重复时记录
+
+        Args:
+            key: 消息标识
+
+        Returns:
+            是否在时间窗口内已经出现过
+        """
+        now = time.monotonic()
+        self._evict(now)
+        if key in self._seen:
+            return True
+        self._seen[key] = now
+        return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+def message_fingerprint(
+    message_id: Optional[Any],
+    sender_id: Any,
+    launcher_type: Any,
+    launcher_id: Any,
+    text: str,
+    timestamp: Optional[Any]
+) -> Optional[str]:
+    """
+    生成消息去重标识
+
+    优先使用平台消息ID；没有消息ID时使用发送者、会话、文本和时间戳的哈希。
+    两者都没有时返回None（不去重），避免误丢用户主动重复发送的消息
+
+    Args:
+        message_id: 平台消息ID
+        sender_id: 发送者ID
+        launcher_type: 会话类型
+        launcher_id: 会话ID
+        text: 消息文本
+        timestamp: 消息时间戳
+
+    Returns:
+        去重标识或None
+    """
+    if message_id not in (None, '', -1):
+        return f"id:{launcher_type}:{launcher_id}:{message_id}"
+    if timestamp is None:
+        return None
+    raw = f"{sender_id}\x00{launcher_type}\x00{launcher_id}\x00{text}\x00{timestamp}"
+    return "hash:" + hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
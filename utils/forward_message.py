@@ -4,11 +4,14 @@
 支持多种模式：单节点模式和多节点模式
 """
 
-import json
 import re
 import aiohttp
 import os
-from typing import List, Dict, Optional
+from .codec import dumps, decode_body
+from .spans import span
+from .deadline import Deadline, DeadlineExceeded, stage_timeout
+from .http_pool import shared_session
+from typing import Any, List, Dict, Optional
 
 
 class ForwardMessageSender:
@@ -40,7 +43,9 @@ class ForwardMessageSender:
         nickname: str = "消息助手",
         mode: str = "multi",
         group_id: Optional[int] = None,
-        target_user_id: Optional[int] = None
+        target_user_id: Optional[int] = None,
+        trace: Optional[Any] = None,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, any]:
         """
         发送合并转发消息
@@ -57,10 +62,33 @@ class ForwardMessageSender:
                 - "multi": 多节点模式，每条消息作为独立节点（默认）
             group_id: 目标群号（群聊时使用）
             target_user_id: 目标用户QQ号（私聊时使用）
+            trace: 交互追踪记录（可选），用于记录发送耗时
+            deadline: 交互截止时间（可选），请求超时不超过剩余时间
 
         Returns:
             API响应结果
         """
+        with span(trace, 'forward_message.send', mode=mode, count=len(messages)) as stage:
+            result = await self._send_forward(
+                messages, prompt, summary, source, user_id, nickname, mode, group_id, target_user_id, deadline
+            )
+            stage.set(success=result.get('success'))
+            return result
+
+    async def _send_forward(
+        self,
+        messages: List[Dict],
+        prompt: str,
+        summary: str,
+        source: str,
+        user_id: str,
+        nickname: str,
+        mode: str,
+        group_id: Optional[int],
+        target_user_id: Optional[int],
+        deadline: Optional[Deadline]
+    ) -> Dict[str, any]:
+        """发送合并转发消息的具体实现"""
         if not group_id and not target_user_id:
             return {
                 "success": False,
@@ -93,37 +121,42 @@ class ForwardMessageSender:
             message_data["user_id"] = target_user_id
 
         # 发送HTTP请求
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.http_url}/send_forward_msg",
-                    json=message_data,
-                    headers=self.headers,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    result = await response.json()
-
-                    if response.status == 200:
-                        return {
-                            "success": True,
-                            "data": result
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "error": f"HTTP {response.status}",
-                            "data": result
-                        }
-            except aiohttp.ClientError as e:
-                return {
-                    "success": False,
-                    "error": str(e)
-                }
-            except Exception as e:
-                return {
-                    "success": False,
-                    "error": f"Unexpected error: {str(e)}"
-                }
+        session = shared_session()
+        try:
+            async with session.post(
+                f"{self.http_url}/send_forward_msg",
+                data=dumps(message_data),
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=stage_timeout(deadline, 30))
+            ) as response:
+                result = decode_body(await response.read())
+
+                if response.status == 200:
+                    return {
+                        "success": True,
+                        "data": result
+                    }
+                else:
+                    return {
+                        "success": False,
+                        "error": f"HTTP {response.status}",
+                        "data": result
+                    }
+        except aiohttp.ClientError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        except DeadlineExceeded as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Unexpected error: {str(e)}"
+            }
 
     def _build_single_node(self, messages: List[Dict], user_id: str, nickname: str) -> List[Dict]:
         """
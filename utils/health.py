@@ -0,0 +1,104 @@
+"""
+上游健康状态模块
+连续失败达到阈值时进入降级模式，暂停向上游发送请求，
+由后台健康检查定期探测，恢复后自动退出降级模式
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from .metrics import metrics
+
+
+class UpstreamUnavailable(Exception):
+    """上游处于降级状态，请求未发送"""
+
+
+class HealthMonitor:
+    """上游健康状态监控（熔断器）"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        probe_interval: float = 15.0,
+        probe: Optional[Callable[[], Awaitable[bool]]] = None,
+        name: str = "upstream"
+    ):
+        """
+        初始化健康状态监控
+
+        Args:
+            failure_threshold: 连续失败多少次后进入降级模式
+            probe_interval: 降级期间健康检查的间隔（秒）
+            probe: 健康检查函数，返回上游是否可用
+            name: 名称，用于日志和指标
+        """
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe = probe
+        self.name = name
+        self._failures = 0
+        self._degraded_since: Optional[float] = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def degraded(self) -> bool:
+        """是否处于降级模式"""
+        return self._degraded_since is not None
+
+    def allow_request(self) -> bool:
+        """
+        是否允许向上游发送请求（降级期间抑制请求和重试）
+
+        Returns:
+            是否允许
+        """
+        return not self.degraded
+
+    def record_success(self):
+        """记录一次成功请求"""
+        self._failures = 0
+        if self.degraded:
+            self._recover()
+
+    def record_failure(self):
+        """记录一次失败请求，连续失败达到阈值时进入降级模式"""
+        self._failures += 1
+        if not self.degraded and self._failures >= self.failure_threshold:
+            self._degrade()
+
+    def _degrade(self):
+        """进入降级模式并启动健康检查"""
+        self._degraded_since = time.monotonic()
+        metrics.incr(f'health.{self.name}.degraded')
+        print(f"{self.name} 连续请求失败，进入降级模式")
+        if self.probe and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    def _recover(self):
+        """退出降级模式"""
+        duration = time.monotonic() - self._degraded_since
+        self._degraded_since = None
+        self._failures = 0
+        metrics.incr(f'health.{self.name}.recovered')
+        print(f"{self.name} 已恢复，降级持续 {duration:.0f} 秒")
+
+    async def _probe_loop(self):
+        """降级期间定期健康检查，成功后退出降级模式"""
+        while self.degraded:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                healthy = await self.probe()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                healthy = False
+            if healthy:
+                self.record_success()
+
+    def stop(self):
+        """停止健康检查任务"""
+        if self._probe_task and not self._probe_task.done():
+            self._probe_task.cancel()
+        self._probe_task = None
@@ -0,0 +1,117 @@
+"""
+共享HTTP连接池模块
+所有对上游音乐接口、NapCat 和第三方服务的请求复用同一个带连接池的会话，
+避免每次请求重新进行 DNS 解析和 TCP/TLS 握手；支持启动时预热连接
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from .metrics import metrics
+
+
+class HttpPool:
+    """带连接池的共享 aiohttp 会话"""
+
+    def __init__(
+        self,
+        limit: int = 32,
+        limit_per_host: int = 8,
+        keepalive_timeout: float = 75.0,
+        dns_cache_ttl: int = 300
+    ):
+        """
+        初始化连接池
+
+        Args:
+            limit: 连接总数上限
+            limit_per_host: 每个主机的连接数上限
+            keepalive_timeout: 空闲连接保持时间（秒）
+            dns_cache_ttl: DNS 解析结果缓存时间（秒）
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def session(self) -> aiohttp.ClientSession:
+        """
+        获取共享会话，首次使用或事件循环变化时创建
+
+        Returns:
+            ClientSession，调用方不应关闭
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._loop = loop
+        return self._session
+
+    async def ping(self, url: str, timeout: float = 3.0) -> bool:
+        """
+        向地址发送 HEAD 请求，建立或保持池中的连接（只关心连接是否可用，不检查状态码）
+
+        Args:
+            url: 地址
+            timeout: 超时时间（秒）
+
+        Returns:
+            是否连接成功
+        """
+        try:
+            async with self.session().head(url, timeout=aiohttp.ClientTimeout(total=timeout)):
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            metrics.incr('http_pool.ping.failed')
+            return False
+        return True
+
+    async def warm(self, urls: List[str], timeout: float = 3.0) -> Dict[str, bool]:
+        """
+        预先建立到各地址的连接（完成 DNS 解析和握手），连接放回池中供后续请求复用
+
+        Args:
+            urls: 地址列表
+            timeout: 单个地址的超时时间（秒）
+
+        Returns:
+            地址 -> 是否连接成功
+        """
+        results = await asyncio.gather(*(self.ping(url, timeout) for url in urls))
+        for url, ok in zip(urls, results):
+            if not ok:
+                print(f"预热连接失败: {url}")
+        return dict(zip(urls, results))
+
+    async def close(self):
+        """关闭共享会话及其连接"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+# 全局共享连接池
+http_pool = HttpPool()
+
+
+def shared_session() -> aiohttp.ClientSession:
+    """
+    便捷函数：获取全局共享会话
+
+    Returns:
+        ClientSession，调用方不应关闭
+    """
+    return http_pool.session()
@@ -0,0 +1,137 @@
+"""
+链接探测模块
+通过 HEAD 请求（不支持时回退为 Range GET）获取链接的可用性、大小和首字节延迟，
+并提供带结果缓存的并发校验
+"""
+
+import asyncio
+import re
+import time
+from collections import namedtuple
+from typing import Any, List, Optional
+
+import aiohttp
+
+from .http_pool import shared_session
+from .metrics import metrics
+
+
+# 链接探测结果：ok 是否可用，status HTTP状态码（请求失败时为0），
+# content_length 资源大小（字节，未知时为None），latency 首字节延迟（秒，请求失败时为None）
+ProbeResult = namedtuple('ProbeResult', ['ok', 'status', 'content_length', 'latency'])
+
+_CONTENT_RANGE_TOTAL = re.compile(r'/(\d+)\s*$')
+
+
+def _content_length(response: aiohttp.ClientResponse) -> Optional[int]:
+    """从响应头中解析资源总大小"""
+    content_range = response.headers.get('Content-Range')
+    if content_range:
+        match = _CONTENT_RANGE_TOTAL.search(content_range)
+        if match:
+            return int(match.group(1))
+    length = response.headers.get('Content-Length')
+    if length and length.isdigit() and response.status != 206:
+        return int(length)
+    return None
+
+
+async def probe_url(url: str, timeout: float = 2.0, session: Optional[aiohttp.ClientSession] = None) -> ProbeResult:
+    """
+    探测链接
+
+    Args:
+        url: 链接地址
+        timeout: 超时时间（秒）
+        session: 复用的 HTTP 会话，默认临时创建
+
+    Returns:
+        探测结果
+    """
+    if not url or not url.startswith(('http://', 'https://')):
+        return ProbeResult(False, 0, None, None)
+
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession()
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    try:
+        start = time.monotonic()
+        async with session.head(url, allow_redirects=True, timeout=client_timeout) as response:
+            latency = time.monotonic() - start
+            if response.status < 400:
+                return ProbeResult(True, response.status, _content_length(response), latency)
+            if response.status not in (403, 405, 501):
+                return ProbeResult(False, response.status, None, latency)
+
+        # 部分 CDN 不支持 HEAD，改为只请求第一个字节
+        start = time.monotonic()
+        async with session.get(
+            url, headers={'Range': 'bytes=0-0'}, allow_redirects=True, timeout=client_timeout
+        ) as response:
+            latency = time.monotonic() - start
+            return ProbeResult(response.status < 400, response.status, _content_length(response), latency)
+    except Exception:
+        return ProbeResult(False, 0, None, None)
+    finally:
+        if own_session:
+            await session.close()
+
+
+class LinkProber:
+    """带结果缓存的并发链接探测器"""
+
+    def __init__(self, timeout: float = 1.5, cache: Optional[Any] = None, ok_ttl: float = 300, fail_ttl: float = 30):
+        """
+        初始化链接探测器
+
+        Args:
+            timeout: 单个链接探测超时时间（秒）
+            cache: 探测结果缓存（TTLCache），默认不缓存
+            ok_ttl: 可用结果的缓存时间（秒）
+            fail_ttl: 不可用结果的缓存时间（秒），较短以便链接恢复后能及时发现
+        """
+        self.timeout = timeout
+        self.cache = cache
+        self.ok_ttl = ok_ttl
+        self.fail_ttl = fail_ttl
+
+    async def probe(self, url: str, timeout: Optional[float] = None, session: Optional[aiohttp.ClientSession] = None) -> ProbeResult:
+        """
+        探测单个链接，优先使用缓存结果
+
+        Args:
+            url: 链接地址
+            timeout: 超时时间（秒），默认使用初始化时的值
+            session: 复用的 HTTP 会话
+
+        Returns:
+            探测结果
+        """
+        if self.cache is not None and url:
+            cached = await self.cache.get(url)
+            if cached is not None:
+                metrics.incr('link_probe.cache_hit')
+                return ProbeResult(*cached)
+
+        result = await probe_url(url, timeout=timeout or self.timeout, session=session)
+        metrics.incr('link_probe.ok' if result.ok else 'link_probe.dead')
+        # 请求失败（超时等）不缓存，避免把偶发的网络抖动当作链接失效
+        if self.cache is not None and url and result.status:
+            await self.cache.set(url, list(result), ttl=self.ok_ttl if result.ok else self.fail_ttl)
+        return result
+
+    async def validate(self, urls: List[str], timeout: Optional[float] = None) -> List[bool]:
+        """
+        并发校验多个链接
+
+        Args:
+            urls: 链接列表
+            timeout: 单个链接超时时间（秒）
+
+        Returns:
+            与 urls 一一对应的可用性列表
+        """
+        session = shared_session()
+        results = await asyncio.gather(*(self.probe(url, timeout, session) for url in urls))
+        return [result.ok for result in results]
@@ -0,0 +1,54 @@
+"""
+运行指标模块
+提供简单的进程内计数器，用于统计缓存命中、上游请求等
+"""
+
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """进程内计数器集合"""
+
+    def __init__(self):
+        """初始化计数器"""
+        self._counters: Dict[str, int] = defaultdict(int)
+
+    def incr(self, name: str, value: int = 1):
+        """
+        增加计数
+
+        Args:
+            name: 指标名称，如 'search_cache.hit'
+            value: 增加的数值，默认为1
+        """
+        self._counters[name] += value
+
+    def get(self, name: str) -> int:
+        """
+        获取指标当前值
+
+        Args:
+            name: 指标名称
+
+        Returns:
+            当前计数，不存在时为0
+        """
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        获取全部指标的快照
+
+        Returns:
+            指标名称到计数的字典
+        """
+        return dict(self._counters)
+
+    def reset(self):
+        """清空全部指标"""
+        self._counters.clear()
+
+
+# 全局指标实例
+metrics = Metrics()
@@ -3,9 +3,12 @@
 支持通过NapCat HTTP API发送QQ音乐卡片
 """
 
-import json
 import asyncio
 import aiohttp
+from .codec import dumps, decode_body
+from .spans import span
+from .deadline import Deadline, DeadlineExceeded, stage_timeout
+from .http_pool import shared_session
 from typing import Optional, Dict, Any
 
 
@@ -36,7 +39,9 @@ class MusicCardSender:
         audio_url: str,
         jump_url: str,
         image_url: Optional[str] = None,
-        content: Optional[str] = None
+        content: Optional[str] = None,
+        trace: Optional[Any] = None,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
         发送自定义音乐卡片
@@ -49,11 +54,33 @@ class MusicCardSender:
             jump_url: 点击卡片跳转链接
             image_url: 封面图片URL（可选）
             content: 音乐描述（可选）
+            trace: 交互追踪记录（可选），用于记录发送耗时
+            deadline: 交互截止时间（可选），请求超时不超过剩余时间
 
         Returns:
             API响应结果
         """
 
+        with span(trace, 'music_card.send', target_type=target_type) as stage:
+            result = await self._send_custom_music_card(
+                target_id, target_type, title, audio_url, jump_url, image_url, content, deadline
+            )
+            stage.set(success=result.get('success'))
+            return result
+
+    async def _send_custom_music_card(
+        self,
+        target_id: int,
+        target_type: str,
+        title: str,
+        audio_url: str,
+        jump_url: str,
+        image_url: Optional[str],
+        content: Optional[str],
+        deadline: Optional[Deadline]
+    ) -> Dict[str, Any]:
+        """发送自定义音乐卡片的具体实现"""
+
         # 构建音乐卡片消息段
         music_segment = {
             "type": "music",
@@ -89,37 +116,42 @@ class MusicCardSender:
             }
 
         # 发送HTTP请求
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    endpoint,
-                    json=data,
-                    headers=self.headers,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    result = await response.json()
+        session = shared_session()
+        try:
+            async with session.post(
+                endpoint,
+                data=dumps(data),
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=stage_timeout(deadline, 10))
+            ) as response:
+                result = decode_body(await response.read())
 
-                    if response.status == 200:
-                        return {
-                            "success": True,
-                            "data": result
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "error": f"HTTP {response.status}",
-                            "data": result
-                        }
-            except aiohttp.ClientError as e:
-                return {
-                    "success": False,
-                    "error": str(e)
-                }
-            except Exception as e:
-                return {
-                    "success": False,
-                    "error": f"Unexpected error: {str(e)}"
-                }
+                if response.status == 200:
+                    return {
+                        "success": True,
+                        "data": result
+                    }
+                else:
+                    return {
+                        "success": False,
+                        "error": f"HTTP {response.status}",
+                        "data": result
+                    }
+        except aiohttp.ClientError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        except DeadlineExceeded as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Unexpected error: {str(e)}"
+            }
 
     async def send_platform_music_card(
         self,
@@ -168,37 +200,37 @@ class MusicCardSender:
             }
 
         # 发送HTTP请求
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    endpoint,
-                    json=data,
-                    headers=self.headers,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    result = await response.json()
+        session = shared_session()
+        try:
+            async with session.post(
+                endpoint,
+                data=dumps(data),
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                result = decode_body(await response.read())
 
-                    if response.status == 200:
-                        return {
-                            "success": True,
-                            "data": result
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "error": f"HTTP {response.status}",
-                            "data": result
-                        }
-            except aiohttp.ClientError as e:
-                return {
-                    "success": False,
-                    "error": str(e)
-                }
-            except Exception as e:
-                return {
-                    "success": False,
-                    "error": f"Unexpected error: {str(e)}"
-                }
+                if response.status == 200:
+                    return {
+                        "success": True,
+                        "data": result
+                    }
+                else:
+                    return {
+                        "success": False,
+                        "error": f"HTTP {response.status}",
+                        "data": result
+                    }
+        except aiohttp.ClientError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Unexpected error: {str(e)}"
+            }
 
     def update_config(self, http_url: Optional[str] = None, access_token: Optional[str] = None):
         """
@@ -0,0 +1,90 @@
+"""
+出站消息合并模块
+按目标（群或私聊）短暂缓冲回复，在时间窗口结束时合并为一次发送，
+避免繁忙群聊中逐条发送导致被限流
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import metrics
+
+
+FlushCallback = Callable[[List[Any]], Awaitable[None]]
+
+
+class _Buffer:
+    """单个目标的待发送缓冲"""
+
+    __slots__ = ('items', 'flush', 'task')
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.flush: Optional[FlushCallback] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class OutboundCoalescer:
+    """按目标合并短时间内的多条回复"""
+
+    def __init__(self, window: float = 0.3, max_items: int = 10):
+        """
+        初始化出站合并缓冲
+
+        Args:
+            window: 合并窗口（秒），从目标的第一条消息开始计时，任何回复的等待时间都不超过该值；
+                    为0时不缓冲，直接发送
+            max_items: 单次合并的最大消息数，达到后立即发送
+        """
+        self.window = window
+        self.max_items = max_items
+        self._buffers: Dict[str, _Buffer] = {}
+
+    async def submit(self, key: str, item: Any, flush: FlushCallback):
+        """
+        提交一条待发送消息
+
+        Args:
+            key: 目标标识，如 'group:123456'
+            item: 消息内容，原样传给 flush
+            flush: 发送函数，接收该目标本窗口内的全部消息；以最后一次提交的为准
+        """
+        if self.window <= 0:
+            await flush([item])
+            return
+
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = _Buffer()
+            self._buffers[key] = buffer
+            buffer.task = asyncio.create_task(self._flush_later(key, buffer))
+        buffer.items.append(item)
+        buffer.flush = flush
+
+        if len(buffer.items) >= self.max_items:
+            buffer.task.cancel()
+            await self._flush(key, buffer)
+
+    async def _flush_later(self, key: str, buffer: _Buffer):
+        """窗口结束后发送"""
+        await asyncio.sleep(self.window)
+        await self._flush(key, buffer)
+
+    async def _flush(self, key: str, buffer: _Buffer):
+        """发送并移除某个目标的缓冲"""
+        if self._buffers.get(key) is not buffer:
+            return
+        del self._buffers[key]
+        metrics.incr('outbound.flushes')
+        metrics.incr('outbound.items', len(buffer.items))
+        try:
+            await buffer.flush(buffer.items)
+        except Exception as e:
+            print(f"合并发送消息失败: {str(e)}")
+
+    async def flush_all(self):
+        """立即发送全部缓冲中的消息"""
+        for key, buffer in list(self._buffers.items()):
+            if buffer.task:
+                buffer.task.cancel()
+            await self._flush(key, buffer)
@@ -0,0 +1,262 @@
+"""
+热度统计与缓存预热模块
+使用带衰减的 Count-Min Sketch 统计热门搜索词和热门歌曲，
+并由后台任务在缓存过期前提前刷新热门条目
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import metrics
+from .rate_limit import TokenBucket
+
+
+class DecayingCountMinSketch:
+    """带指数衰减的 Count-Min Sketch"""
+
+    # 缩放因子超过该值时重新归一化，避免浮点溢出
+    _RESCALE_LIMIT = 1e12
+
+    def __init__(self, width: int = 2048, depth: int = 4, half_life: float = 600.0):
+        """
+        初始化 Sketch
+
+        Args:
+            width: 每行计数器数量
+            depth: 哈希行数
+            half_life: 计数衰减半衰期（秒）
+        """
+        self.width = width
+        self.depth = depth
+        self._tau = half_life / math.log(2)
+        self._rows = [[0.0] * width for _ in range(depth)]
+        self._epoch = time.monotonic()
+
+    def _indexes(self, key: str) -> List[int]:
+        """计算键在每一行中的位置"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def _scale(self, now: float) -> float:
+        """
+        计算当前时刻的写入缩放因子
+
+        计数按 exp((t - epoch) / tau) 放大写入，读取时再按同一因子缩小，
+        从而无需逐个计数器衰减
+        """
+        scale = math.exp((now - self._epoch) / self._tau)
+        if scale > self._RESCALE_LIMIT:
+            for row in self._rows:
+                for i, value in enumerate(row):
+                    row[i] = value / scale
+            self._epoch = now
+            scale = 1.0
+        return scale
+
+    def add(self, key: str, weight: float = 1.0) -> float:
+        """
+        记录一次出现
+
+        Args:
+            key: 统计键
+            weight: 权重
+
+        Returns:
+            记录后的估计值
+        """
+        scale = self._scale(time.monotonic())
+        increment = weight * scale
+        estimate = None
+        for row, index in zip(self._rows, self._indexes(key)):
+            row[index] += increment
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate / scale
+
+    def estimate(self, key: str) -> float:
+        """
+        估计键的当前（衰减后）频次
+
+        Args:
+            key: 统计键
+
+        Returns:
+            估计频次
+        """
+        scale = self._scale(time.monotonic())
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key))) / scale
+
+
+class PopularityTracker:
+    """热门搜索词与热门歌曲统计"""
+
+    def __init__(self, top_k: int = 20, half_life: float = 600.0, width: int = 2048, depth: int = 4):
+        """
+        初始化热度统计
+
+        Args:
+            top_k: 每类需要维护的热门条目数
+            half_life: 热度半衰期（秒）
+            width: Sketch 宽度
+            depth: Sketch 深度
+        """
+        self.top_k = top_k
+        self._sketch = DecayingCountMinSketch(width=width, depth=depth, half_life=half_life)
+        # 候选热门条目：类别 -> {统计键: 负载}，容量为 top_k 的若干倍以减少抖动
+        self._candidates: Dict[str, Dict[str, Any]] = {}
+        self._capacity = max(top_k * 4, 16)
+
+    def record(self, kind: str, key: str, payload: Any = None):
+        """
+        记录一次访问
+
+        Args:
+            kind: 类别，如 'search' 或 'detail'
+            key: 统计键（与缓存键一致）
+            payload: 预热时传给加载函数的参数
+        """
+        estimate = self._sketch.add(f"{kind}\x00{key}")
+        candidates = self._candidates.setdefault(kind, {})
+        if key in candidates or len(candidates) < self._capacity:
+            candidates[key] = payload
+            return
+
+        # 候选已满时，替换当前最冷的条目
+        coldest_key = min(candidates, key=lambda k: self._sketch.estimate(f"{kind}\x00{k}"))
+        if self._sketch.estimate(f"{kind}\x00{coldest_key}") < estimate:
+            del candidates[coldest_key]
+            candidates[key] = payload
+
+    def record_search(self, query: str):
+        """
+        记录一次搜索
+
+        Args:
+            query: 归一化后的搜索词
+        """
+        self.record('search', query, query)
+
+    def record_detail(self, key: str, song_title: str, song_n: Any, br: Optional[str] = None):
+        """
+        记录一次歌曲详情请求
+
+        Args:
+            key: 详情缓存键
+            song_title: 歌曲名
+            song_n: 歌曲序号
+            br: 音质参数
+        """
+        self.record('detail', key, (song_title, song_n, br))
+
+    def top(self, kind: str, k: Optional[int] = None) -> List[Tuple[str, Any, float]]:
+        """
+        获取某类别的热门条目
+
+        Args:
+            kind: 类别
+            k: 数量，默认为 top_k
+
+        Returns:
+            (统计键, 负载, 热度) 列表，按热度降序
+        """
+        candidates = self._candidates.get(kind, {})
+        ranked = [
+            (key, payload, self._sketch.estimate(f"{kind}\x00{key}"))
+            for key, payload in candidates.items()
+        ]
+        ranked.sort(key=lambda item: item[2], reverse=True)
+        return ranked[:k or self.top_k]
+
+
+class CacheWarmer:
+    """后台缓存预热器"""
+
+    def __init__(
+        self,
+        tracker: PopularityTracker,
+        interval: float = 30.0,
+        refresh_ahead: float = 90.0,
+        budget_per_minute: float = 30.0,
+        min_hits: float = 2.0,
+        budget: Any = None
+    ):
+        """
+        初始化缓存预热器
+
+        Args:
+            tracker: 热度统计实例
+            interval: 检查间隔（秒）
+            refresh_ahead: 剩余有效期低于该值时提前刷新（秒），应大于 interval
+            budget_per_minute: 预热任务每分钟允许的上游请求数
+            min_hits: 热度低于该值的条目不预热
+            budget: 自定义限流器（需提供 try_acquire 方法），默认按 budget_per_minute 创建进程内令牌桶
+        """
+        self.tracker = tracker
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.min_hits = min_hits
+        self.budget = budget or TokenBucket(rate=budget_per_minute / 60.0, capacity=max(budget_per_minute, 1))
+        self._targets: Dict[str, Tuple[Any, Callable[[Any], Awaitable[Any]]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, kind: str, cache: Any, loader: Callable[[Any], Awaitable[Any]]):
+        """
+        注册需要预热的缓存
+
+        Args:
+            kind: 类别（与 PopularityTracker.record 的类别一致）
+            cache: 缓存实例，需提供 ttl_remaining/set 方法
+            loader: 加载函数，接收负载并返回新值，返回None表示不写入缓存
+        """
+        self._targets[kind] = (cache, loader)
+
+    def start(self):
+        """启动后台预热任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """停止后台预热任务"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        """后台循环"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"缓存预热出错: {str(e)}")
+
+    async def refresh_once(self) -> int:
+        """
+        执行一轮预热
+
+        Returns:
+            本轮刷新的条目数
+        """
+        refreshed = 0
+        for kind, (cache, loader) in self._targets.items():
+            for key, payload, hits in self.tracker.top(kind):
+                if hits < self.min_hits:
+                    break
+                if await cache.ttl_remaining(key) > self.refresh_ahead:
+                    continue
+                if not await self.budget.try_acquire():
+                    metrics.incr('warmer.budget_exhausted')
+                    return refreshed
+                value = await loader(payload)
+                if value is not None:
+                    await cache.set(key, value)
+                    refreshed += 1
+                    metrics.incr(f'warmer.{kind}.refreshed')
+        return refreshed
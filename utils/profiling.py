@@ -0,0 +1,159 @@
+"""
+按需性能分析模块
+由管理员指令开启 cProfile，在处理指定条数的消息或经过指定时间后自动停止，
+将统计文件（.prof）和耗时最多的函数摘要写入数据目录；未开启时不产生任何开销
+"""
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import time
+from typing import Callable, Optional, Tuple
+
+from .metrics import metrics
+
+
+# 未指定参数时分析的消息条数
+DEFAULT_PROFILE_EVENTS = 100
+# 按条数分析时的最长持续时间（秒），避免长时间无消息时一直开启
+MAX_PROFILE_SECONDS = 600
+
+
+def parse_profile_args(text: str) -> Tuple[int, float]:
+    """
+    解析性能分析指令参数
+
+    Args:
+        text: 指令后的文本，如 '200'（条消息）或 '30秒' / '30s'（秒）
+
+    Returns:
+        (消息条数, 持续秒数)，为0表示不按该条件停止
+
+    Raises:
+        ValueError: 参数格式不正确
+    """
+    text = text.strip().lower()
+    if not text:
+        return DEFAULT_PROFILE_EVENTS, MAX_PROFILE_SECONDS
+    for unit in ('秒', 's'):
+        if text.endswith(unit):
+            seconds = float(text[:-len(unit)])
+            if seconds <= 0:
+                raise ValueError(text)
+            return 0, min(seconds, MAX_PROFILE_SECONDS)
+    events = int(text)
+    if events <= 0:
+        raise ValueError(text)
+    return events, MAX_PROFILE_SECONDS
+
+
+class ProfileSession:
+    """一次性能分析，达到消息条数或持续时间后停止并写入结果"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        max_events: int = DEFAULT_PROFILE_EVENTS,
+        duration: float = MAX_PROFILE_SECONDS,
+        top_n: int = 30,
+        on_stop: Optional[Callable[["ProfileSession"], None]] = None
+    ):
+        """
+        初始化性能分析
+
+        Args:
+            output_dir: 结果文件目录
+            max_events: 分析的消息条数，0表示只按时间停止
+            duration: 最长持续时间（秒），0表示只按条数停止
+            top_n: 摘要中列出的函数数
+            on_stop: 停止后的回调
+        """
+        self.output_dir = output_dir
+        self.max_events = max_events
+        self.duration = duration
+        self.top_n = top_n
+        self.on_stop = on_stop
+        self.events = 0
+        self.path: Optional[str] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._started_at = 0.0
+
+    @property
+    def active(self) -> bool:
+        """是否正在分析"""
+        return self._profile is not None
+
+    def start(self):
+        """
+        开始分析
+
+        Raises:
+            ValueError: 已有其他分析工具在运行
+        """
+        profile = cProfile.Profile()
+        profile.enable()
+        self._profile = profile
+        self._started_at = time.monotonic()
+        if self.duration:
+            self._timer = asyncio.get_running_loop().call_later(self.duration, self.stop)
+        metrics.incr('profiling.started')
+
+    def record_event(self):
+        """记录处理完一条消息，达到条数后停止"""
+        self.events += 1
+        if self.max_events and self.events >= self.max_events:
+            self.stop()
+
+    def stop(self) -> Optional[str]:
+        """
+        停止分析并写入统计文件和摘要
+
+        Returns:
+            统计文件路径，未在分析或写入失败时为None
+        """
+        profile = self._profile
+        if profile is None:
+            return self.path
+        profile.disable()
+        self._profile = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        elapsed = time.monotonic() - self._started_at
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, time.strftime('profile-%Y%m%d-%H%M%S'))
+            profile.dump_stats(base + '.prof')
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(f"消息数: {self.events}  持续时间: {elapsed:.1f} 秒\n")
+                f.write(self.summary(profile))
+            self.path = base + '.prof'
+            print(f"性能分析已写入: {self.path}")
+        except Exception as e:
+            print(f"写入性能分析结果失败: {str(e)}")
+
+        metrics.incr('profiling.finished')
+        if self.on_stop:
+            self.on_stop(self)
+        return self.path
+
+    def summary(self, profile: cProfile.Profile) -> str:
+        """
+        生成按累计耗时和自身耗时排序的函数摘要
+
+        Args:
+            profile: 已停止的分析器
+
+        Returns:
+            摘要文本
+        """
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream).strip_dirs()
+        for sort_key in ('cumulative', 'tottime'):
+            stream.write(f"\n===== 按 {sort_key} 排序 =====\n")
+            stats.sort_stats(sort_key).print_stats(self.top_n)
+        return stream.getvalue()
@@ -0,0 +1,102 @@
+"""
+音质协商模块
+并发获取多个音质的下载链接并探测大小与首字节延迟，
+在配置的大小和延迟预算内选择最高音质
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Optional, Tuple
+
+from .deadline import Deadline, DeadlineExceeded, stage_timeout
+from .http_pool import shared_session
+from .link_probe import LinkProber
+from .metrics import metrics
+from .query import QUALITY_LEVELS
+from .records import SongDetail
+
+
+class QualityNegotiator:
+    """在大小与延迟预算内选择最高音质"""
+
+    def __init__(
+        self,
+        max_size_mb: float = 30.0,
+        max_first_byte: float = 1.5,
+        probe_timeout: float = 2.0,
+        prober: Optional[LinkProber] = None
+    ):
+        """
+        初始化音质协商器
+
+        Args:
+            max_size_mb: 文件大小上限（MB），0表示不限制
+            max_first_byte: 首字节延迟上限（秒）
+            probe_timeout: 单个链接探测超时时间（秒）
+            prober: 共享的链接探测器（复用其探测结果缓存），默认不缓存
+        """
+        self.max_size = max_size_mb * 1024 * 1024
+        self.max_first_byte = max_first_byte
+        self.probe_timeout = probe_timeout
+        self.prober = prober or LinkProber(timeout=probe_timeout)
+
+    def _fits(self, content_length: Optional[int], latency: Optional[float]) -> bool:
+        """判断探测结果是否在预算内，大小未知时视为满足"""
+        if latency is None or latency > self.max_first_byte:
+            return False
+        if self.max_size and content_length is not None and content_length > self.max_size:
+            return False
+        return True
+
+    async def negotiate(
+        self,
+        fetch_detail: Callable[[str], Awaitable[SongDetail]],
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[str, SongDetail]:
+        """
+        协商音质
+
+        Args:
+            fetch_detail: 按 br 参数获取歌曲详情的函数
+            deadline: 交互截止时间（可选），探测超时不超过剩余时间
+
+        Returns:
+            (选中的 br 参数, 歌曲详情)；没有音质满足预算时返回可用的最低音质，
+            全部不可用时返回最高音质的详情
+        """
+        bitrates = list(QUALITY_LEVELS.values())
+        details = await asyncio.gather(*(fetch_detail(br) for br in bitrates))
+
+        try:
+            probe_timeout = stage_timeout(deadline, self.probe_timeout)
+        except DeadlineExceeded:
+            # 没有时间探测，使用有下载链接的最高音质
+            metrics.incr('quality.deadline_exceeded')
+            return next(
+                ((br, detail) for br, detail in zip(bitrates, details) if detail.music_url),
+                (bitrates[0], details[0])
+            )
+
+        session = shared_session()
+        probes = await asyncio.gather(*(
+            self.prober.probe(
+                detail.music_url,
+                timeout=probe_timeout,
+                session=session
+            )
+            for detail in details
+        ))
+
+        fallback = None
+        for br, detail, probe in zip(bitrates, details, probes):
+            if not probe.ok:
+                continue
+            if self._fits(probe.content_length, probe.latency):
+                metrics.incr(f'quality.selected.{br}')
+                return br, detail
+            fallback = (br, detail)
+
+        if fallback:
+            metrics.incr('quality.over_budget')
+            return fallback
+        metrics.incr('quality.unavailable')
+        return bitrates[0], details[0]
@@ -0,0 +1,61 @@
+"""
+点歌指令解析模块
+搜索词归一化与音质后缀解析，只依赖标准库，处理每条消息时使用，
+不会连带加载热度统计和音质协商等子系统
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """
+    归一化搜索词（去除首尾空白、合并连续空白、转小写）
+
+    Args:
+        query: 原始搜索词
+
+    Returns:
+        归一化后的搜索词
+    """
+    return re.sub(r'\s+', ' ', query.strip()).lower()
+
+
+# 音质名称 -> 上游接口 br 参数，按音质从高到低排列
+QUALITY_LEVELS: Dict[str, str] = {
+    '无损': '1',
+    '高品': '2',
+    '标准': '3',
+}
+
+# 用户可使用的音质别名
+QUALITY_ALIASES: Dict[str, str] = {
+    'flac': '无损',
+    'sq': '无损',
+    'hq': '高品',
+    '320': '高品',
+    '128': '标准',
+    '普通': '标准',
+}
+
+# 最高音质的 br 参数
+BEST_BITRATE = next(iter(QUALITY_LEVELS.values()))
+
+
+def parse_quality_suffix(text: str) -> Tuple[str, Optional[str]]:
+    """
+    解析“点歌 歌名 音质”中末尾的音质后缀
+
+    Args:
+        text: 点歌指令后的文本，如 '晴天 无损'
+
+    Returns:
+        (歌名, 音质名称)，没有音质后缀时音质为None
+    """
+    parts = text.rsplit(maxsplit=1)
+    if len(parts) == 2:
+        suffix = parts[1].lower()
+        quality = suffix if suffix in QUALITY_LEVELS else QUALITY_ALIASES.get(suffix)
+        if quality:
+            return parts[0].strip(), quality
+    return text, None
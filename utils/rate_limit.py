@@ -0,0 +1,80 @@
+"""
+限流模块
+提供令牌桶限流器和共享窗口限流器，用于约束后台任务的上游请求量
+"""
+
+import time
+
+from .state import StateBackend
+
+
+class TokenBucket:
+    """令牌桶限流器"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        """按经过的时间补充令牌"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def try_acquire(self, tokens: float = 1) -> bool:
+        """
+        尝试取出令牌（不等待）
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            是否取到令牌
+        """
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+
+class WindowRateLimiter:
+    """基于状态存储后端的固定窗口限流器（多实例共享额度）"""
+
+    def __init__(self, backend: StateBackend, key: str, limit: int, window: float = 60.0):
+        """
+        初始化限流器
+
+        Args:
+            backend: 状态存储后端
+            key: 限流计数键
+            limit: 每个窗口允许的请求数
+            window: 窗口长度（秒）
+        """
+        self.backend = backend
+        self.key = key
+        self.limit = limit
+        self.window = window
+
+    async def try_acquire(self, tokens: int = 1) -> bool:
+        """
+        尝试占用额度（不等待）
+
+        Args:
+            tokens: 需要的额度
+
+        Returns:
+            是否在当前窗口额度内
+        """
+        slot = int(time.time() // self.window)
+        count = await self.backend.incr(f"{self.key}:{slot}", tokens, ttl=self.window * 2)
+        return count <= self.limit
@@ -0,0 +1,116 @@
+"""
+紧凑记录类型模块
+搜索结果、歌曲详情和待选择会话使用基于元组的记录存储，
+相比字典每条记录占用的内存更少；重复出现的歌手名会被驻留共享
+"""
+
+import sys
+from collections import namedtuple
+from typing import Any, List, Optional
+
+
+# 搜索结果中的单首歌曲：n 上游序号，song_name 歌名，song_singer 歌手
+Song = namedtuple('Song', ['n', 'song_name', 'song_singer'])
+
+# 待选择的搜索会话：songs 完整搜索结果，quality 指定的音质名称，
+# page 当前页（从0开始），cached 是否为降级模式下的缓存结果
+Session = namedtuple('Session', ['songs', 'quality', 'page', 'cached'], defaults=(None, 0, False))
+
+
+class SongDetail(namedtuple('SongDetail', ['code', 'cover', 'music_url', 'link'], defaults=('', '', ''))):
+    """歌曲详情：code 上游状态码，cover 封面链接，music_url 下载链接，link 歌曲页面链接"""
+
+    __slots__ = ()
+
+    @property
+    def ok(self) -> bool:
+        """是否为可缓存的有效详情"""
+        return self.code == 200 and any(self[1:])
+
+
+def make_song(n: Any, song_name: str, song_singer: str) -> Song:
+    """
+    创建歌曲记录，歌手名会被驻留以共享重复字符串
+
+    Args:
+        n: 上游序号
+        song_name: 歌名
+        song_singer: 歌手
+
+    Returns:
+        Song 记录
+    """
+    if isinstance(song_singer, str):
+        song_singer = sys.intern(song_singer)
+    return Song(n, song_name, song_singer)
+
+
+def songs_from_raw(raw: Any) -> Optional[List[Song]]:
+    """
+    将缓存中读出的搜索结果还原为 Song 记录
+
+    内存后端原样返回记录；Redis 后端经 JSON 序列化后元组会变为列表，需要重建
+
+    Args:
+        raw: 缓存值
+
+    Returns:
+        Song 列表，缓存未命中时为None
+    """
+    if raw is None:
+        return None
+    return [song if isinstance(song, Song) else make_song(*song) for song in raw]
+
+
+def session_from_raw(raw: Any) -> Optional[Session]:
+    """
+    将状态后端中读出的会话还原为 Session 记录
+
+    Args:
+        raw: 状态后端中的值
+
+    Returns:
+        Session 记录，会话不存在时为None
+    """
+    if raw is None or isinstance(raw, Session):
+        return raw
+    session = Session(*raw)
+    return session._replace(songs=songs_from_raw(session.songs))
+
+
+def detail_from_payload(payload: Any) -> SongDetail:
+    """
+    从上游详情接口响应创建详情记录，并清理链接中多余的空格和反引号
+
+    Args:
+        payload: 解析后的响应
+
+    Returns:
+        SongDetail 记录
+    """
+    if not isinstance(payload, dict):
+        return SongDetail(500)
+    data = payload.get('data')
+    if not isinstance(data, dict):
+        data = {}
+    return SongDetail(
+        payload.get('code'),
+        str(data.get('cover') or '').strip(' `'),
+        str(data.get('music_url') or '').strip(' `'),
+        str(data.get('link') or ''),
+    )
+
+
+def detail_from_raw(raw: Any) -> Optional[SongDetail]:
+    """
+    将缓存中读出的详情还原为 SongDetail 记录
+
+    Args:
+        raw: 缓存值
+
+    Returns:
+        SongDetail 记录，缓存未命中时为None
+    """
+    if raw is None or isinstance(raw, SongDetail):
+        return raw
+    return SongDetail(*raw)
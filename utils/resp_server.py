@@ -0,0 +1,198 @@
+"""
+本地 Redis 协议替身服务
+实现 RedisStateBackend 用到的命令子集，用于测试和本地多实例调试，无需安装 Redis
+
+用法：
+    python -m utils.resp_server --port 6390
+
+或在测试中：
+    server = MiniRedisServer()
+    await server.start()
+    backend = RedisStateBackend(server.url)
+    ...
+    await server.stop()
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class MiniRedisServer:
+    """最小化的 Redis 协议服务端"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        初始化服务端
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+        """
+        self.host = host
+        self.port = port
+        # 键 -> (过期时间, 值)
+        self._data: Dict[bytes, Tuple[Optional[float], bytes]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        """客户端连接地址"""
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        """启动服务"""
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """停止服务"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _get(self, key: bytes) -> Optional[Tuple[Optional[float], bytes]]:
+        entry = self._data.get(key)
+        if entry and entry[0] is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # 内联命令
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                writer.write(self._encode(self._dispatch(args)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _encode(self, reply: Any) -> bytes:
+        if isinstance(reply, Exception):
+            return f"-ERR {reply}\r\n".encode()
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, str):
+            return f"+{reply}\r\n".encode()
+        if isinstance(reply, int):
+            return f":{reply}\r\n".encode()
+        if isinstance(reply, bytes):
+            return f"${len(reply)}\r\n".encode() + reply + b"\r\n"
+        return f"*{len(reply)}\r\n".encode() + b"".join(self._encode(item) for item in reply)
+
+    def _dispatch(self, args: List[bytes]) -> Any:
+        command = args[0].upper().decode()
+        handler = getattr(self, f"_cmd_{command.lower()}", None)
+        if handler is None:
+            return Exception(f"unknown command '{command}'")
+        try:
+            return handler(*args[1:])
+        except (TypeError, ValueError) as e:
+            return Exception(str(e))
+
+    def _cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def _cmd_auth(self, *args):
+        return "OK"
+
+    def _cmd_select(self, db):
+        return "OK"
+
+    def _cmd_flushall(self, *args):
+        self._data.clear()
+        return "OK"
+
+    def _cmd_get(self, key):
+        entry = self._get(key)
+        return entry[1] if entry else None
+
+    def _cmd_set(self, key, value, *options):
+        expire_at = None
+        nx = False
+        opts = [o.upper() for o in options]
+        i = 0
+        while i < len(opts):
+            if opts[i] == b'PX':
+                expire_at = time.monotonic() + int(opts[i + 1]) / 1000
+                i += 1
+            elif opts[i] == b'EX':
+                expire_at = time.monotonic() + int(opts[i + 1])
+                i += 1
+            elif opts[i] == b'NX':
+                nx = True
+            i += 1
+        if nx and self._get(key):
+            return None
+        self._data[key] = (expire_at, value)
+        return "OK"
+
+    def _cmd_del(self, *keys):
+        return sum(1 for key in keys if self._get(key) and self._data.pop(key, None))
+
+    def _cmd_getdel(self, key):
+        entry = self._get(key)
+        if entry is None:
+            return None
+        del self._data[key]
+        return entry[1]
+
+    def _cmd_pttl(self, key):
+        entry = self._get(key)
+        if entry is None:
+            return -2
+        if entry[0] is None:
+            return -1
+        return int((entry[0] - time.monotonic()) * 1000)
+
+    def _cmd_pexpire(self, key, ms):
+        entry = self._get(key)
+        if entry is None:
+            return 0
+        self._data[key] = (time.monotonic() + int(ms) / 1000, entry[1])
+        return 1
+
+    def _cmd_incrby(self, key, amount):
+        entry = self._get(key)
+        value = int(entry[1]) + int(amount) if entry else int(amount)
+        self._data[key] = (entry[0] if entry else None, str(value).encode())
+        return value
+
+    def _cmd_incr(self, key):
+        return self._cmd_incrby(key, b'1')
+
+
+async def _serve(host: str, port: int):
+    server = MiniRedisServer(host, port)
+    await server.start()
+    print(f"MiniRedisServer 监听于 {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="本地 Redis 协议替身服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
@@ -0,0 +1,142 @@
+"""
+上游请求调度模块
+按优先级分配有限的并发名额：用户已选择歌曲的详情请求优先于新的搜索，
+预热等后台任务优先级最低；等待时间越长优先级越高，避免低优先级请求饿死
+"""
+
+import asyncio
+import itertools
+import time
+from typing import List, Optional
+
+from .deadline import DeadlineExceeded
+from .metrics import metrics
+
+
+# 优先级，数值越小越优先
+PRIORITY_DETAIL = 0      # 用户已选择歌曲后的详情请求
+PRIORITY_SEARCH = 1      # 新的点歌搜索
+PRIORITY_BACKGROUND = 2  # 预热、预取等后台任务
+
+
+class _Waiter:
+    """排队中的请求"""
+
+    __slots__ = ('priority', 'seq', 'enqueued_at', 'future')
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.future = future
+
+
+class PriorityScheduler:
+    """带并发上限和防饿死机制的优先级调度器"""
+
+    def __init__(self, max_concurrency: int = 4, aging: float = 2.0):
+        """
+        初始化调度器
+
+        Args:
+            max_concurrency: 同时进行的上游请求数上限
+            aging: 每等待该秒数，请求的有效优先级提升一级
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.aging = aging
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _effective_priority(self, waiter: _Waiter, now: float) -> float:
+        return waiter.priority - (now - waiter.enqueued_at) / self.aging
+
+    def _wake_next(self):
+        """把空闲名额分配给有效优先级最高的请求"""
+        while self._waiters and self._active < self.max_concurrency:
+            now = time.monotonic()
+            waiter = min(self._waiters, key=lambda w: (self._effective_priority(w, now), w.seq))
+            self._waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            self._active += 1
+            waiter.future.set_result(None)
+
+    async def acquire(self, priority: int = PRIORITY_SEARCH, timeout: Optional[float] = None):
+        """
+        获取一个并发名额，名额不足时按优先级排队
+
+        Args:
+            priority: 请求优先级
+            timeout: 最长排队时间（秒），None表示一直等待
+
+        Raises:
+            DeadlineExceeded: 排队超时，请求已移出队列
+        """
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        metrics.incr(f'scheduler.queued.{priority}')
+        try:
+            if timeout is None:
+                await waiter.future
+            else:
+                await asyncio.wait_for(asyncio.shield(waiter.future), max(timeout, 0))
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 名额已分配但调用方被取消或超时，归还名额
+                self.release()
+            else:
+                waiter.future.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr(f'scheduler.timeout.{priority}')
+                raise DeadlineExceeded(f"排队等待超时（{timeout:g}秒）") from e
+            raise
+        metrics.incr(f'scheduler.wait_ms.{priority}', int((time.monotonic() - waiter.enqueued_at) * 1000))
+
+    def release(self):
+        """归还并发名额"""
+        self._active -= 1
+        self._wake_next()
+
+    def slot(self, priority: int = PRIORITY_SEARCH, timeout: Optional[float] = None) -> "_Slot":
+        """
+        以 async with 方式占用并发名额
+
+        Args:
+            priority: 请求优先级
+            timeout: 最长排队时间（秒），None表示一直等待
+
+        Returns:
+            异步上下文管理器
+        """
+        return _Slot(self, priority, timeout)
+
+    @property
+    def queued(self) -> int:
+        """排队中的请求数"""
+        return len(self._waiters)
+
+
+class _Slot:
+    """PriorityScheduler.slot 返回的上下文管理器"""
+
+    __slots__ = ('scheduler', 'priority', 'timeout')
+
+    def __init__(self, scheduler: PriorityScheduler, priority: int, timeout: Optional[float] = None):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.timeout = timeout
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.priority, self.timeout)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler.release()
+        return False
@@ -0,0 +1,40 @@
+"""
+追踪阶段模块
+业务代码通过 span() 记录阶段耗时；未启用追踪时返回空阶段，
+不需要加载追踪记录器（文件写入、采样等）
+"""
+
+from typing import Optional
+
+
+class _NullSpan:
+    """未启用追踪时使用的空阶段"""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(trace: Optional["Trace"], name: str, **attrs):
+    """
+    在可选的追踪中创建计时阶段，未传入追踪时不做任何记录
+
+    Args:
+        trace: 追踪记录或None
+        name: 阶段名称
+        attrs: 阶段属性
+
+    Returns:
+        上下文管理器
+    """
+    if trace is None:
+        return _NULL_SPAN
+    return trace.span(name, **attrs)
@@ -0,0 +1,348 @@
+"""
+状态存储后端模块
+为会话、缓存和限流计数提供统一的键值存储接口，
+支持进程内存储和 Redis 协议存储（多个插件实例共享状态）
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .codec import dumps, loads
+
+
+class StateBackend:
+    """状态存储后端接口，值为可 JSON 序列化的对象"""
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        读取键值
+
+        Args:
+            key: 键
+
+        Returns:
+            值，不存在或已过期时返回None
+        """
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        写入键值
+
+        Args:
+            key: 键
+            value: 值
+            ttl: 过期时间（秒），None表示不过期
+        """
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        """
+        删除键
+
+        Args:
+            key: 键
+        """
+        raise NotImplementedError
+
+    async def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        原子地在键不存在时写入（用于多实例间去重）
+
+        Args:
+            key: 键
+            value: 值
+            ttl: 过期时间（秒），None表示不过期
+
+        Returns:
+            是否写入成功，键已存在时返回False
+        """
+        raise NotImplementedError
+
+    async def getdel(self, key: str) -> Optional[Any]:
+        """
+        原子地读取并删除键（用于多实例间认领会话）
+
+        Args:
+            key: 键
+
+        Returns:
+            删除前的值，不存在时返回None
+        """
+        raise NotImplementedError
+
+    async def ttl(self, key: str) -> float:
+        """
+        获取键的剩余有效时间
+
+        Args:
+            key: 键
+
+        Returns:
+            剩余秒数；键不存在时返回-1，未设置过期时间时返回 inf
+        """
+        raise NotImplementedError
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """
+        原子地增加计数（用于限流）
+
+        Args:
+            key: 键
+            amount: 增加量
+            ttl: 键首次创建时设置的过期时间（秒）
+
+        Returns:
+            增加后的计数
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """释放后端资源"""
+
+
+class MemoryStateBackend(StateBackend):
+    """进程内状态存储（单实例使用）"""
+
+    def __init__(self, max_keys: int = 8192):
+        """
+        初始化进程内存储
+
+        Args:
+            max_keys: 最大键数量，超出时淘汰最久未使用的键
+        """
+        self.max_keys = max_keys
+        self._data: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def _entry(self, key: str) -> Optional[Tuple[Optional[float], Any]]:
+        """读取未过期的条目，顺带清理已过期条目"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expire_at = entry[0]
+        if expire_at is not None and expire_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def _store(self, key: str, value: Any, ttl: Optional[float]):
+        expire_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (expire_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._store(key, value, ttl)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        if self._entry(key) is not None:
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    async def getdel(self, key: str) -> Optional[Any]:
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        del self._data[key]
+        return entry[1]
+
+    async def ttl(self, key: str) -> float:
+        entry = self._entry(key)
+        if entry is None:
+            return -1
+        if entry[0] is None:
+            return float('inf')
+        return entry[0] - time.monotonic()
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        entry = self._entry(key)
+        if entry is None:
+            self._store(key, amount, ttl)
+            return amount
+        value = int(entry[1]) + amount
+        self._data[key] = (entry[0], value)
+        return value
+
+
+class RedisError(Exception):
+    """Redis 服务端返回的错误"""
+
+
+class _RedisConnection:
+    """单个 RESP 协议连接"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def execute(self, *args) -> Any:
+        """发送命令并读取回复"""
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(f"${len(data)}\r\n".encode())
+            parts.append(data)
+            parts.append(b"\r\n")
+        self.writer.write(b"".join(parts))
+        await self.writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> Any:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis 连接已关闭")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b'+':
+            return payload.decode('utf-8')
+        if prefix == b'-':
+            raise RedisError(payload.decode('utf-8'))
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if prefix == b'*':
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise RedisError(f"无法解析的回复: {line!r}")
+
+    def close(self):
+        self.writer.close()
+
+
+class RedisStateBackend(StateBackend):
+    """Redis 协议状态存储（多实例共享）"""
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", pool_size: int = 4, prefix: str = "musiclink:"):
+        """
+        初始化 Redis 存储
+
+        Args:
+            url: 连接地址，格式 redis://[:password@]host:port/db
+            pool_size: 连接池大小
+            prefix: 键前缀，避免与其他应用冲突
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.prefix = prefix
+        self.pool_size = pool_size
+        self._idle: List[_RedisConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _connect(self) -> _RedisConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        conn = _RedisConnection(reader, writer)
+        if self.password:
+            await conn.execute('AUTH', self.password)
+        if self.db:
+            await conn.execute('SELECT', self.db)
+        return conn
+
+    async def execute(self, *args) -> Any:
+        """
+        执行一条 Redis 命令
+
+        Args:
+            args: 命令及参数
+
+        Returns:
+            服务端回复
+        """
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            try:
+                result = await conn.execute(*args)
+            except RedisError:
+                self._idle.append(conn)
+                raise
+            except BaseException:
+                # 连接状态未知，直接丢弃
+                conn.close()
+                raise
+            self._idle.append(conn)
+            return result
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.execute('GET', self._key(key))
+        return loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if ttl is not None:
+            await self.execute('SET', self._key(key), dumps(value), 'PX', max(int(ttl * 1000), 1))
+        else:
+            await self.execute('SET', self._key(key), dumps(value))
+
+    async def delete(self, key: str):
+        await self.execute('DEL', self._key(key))
+
+    async def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        if ttl is not None:
+            reply = await self.execute('SET', self._key(key), dumps(value), 'NX', 'PX', max(int(ttl * 1000), 1))
+        else:
+            reply = await self.execute('SET', self._key(key), dumps(value), 'NX')
+        return reply == 'OK'
+
+    async def getdel(self, key: str) -> Optional[Any]:
+        raw = await self.execute('GETDEL', self._key(key))
+        return loads(raw) if raw is not None else None
+
+    async def ttl(self, key: str) -> float:
+        pttl = await self.execute('PTTL', self._key(key))
+        if pttl == -2:
+            return -1
+        if pttl == -1:
+            return float('inf')
+        return pttl / 1000
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = await self.execute('INCRBY', self._key(key), amount)
+        if ttl is not None and value == amount:
+            # 首次创建时设置过期时间
+            await self.execute('PEXPIRE', self._key(key), max(int(ttl * 1000), 1))
+        return value
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+def create_state_backend(kind: str = 'memory', url: str = '') -> StateBackend:
+    """
+    根据配置创建状态存储后端
+
+    Args:
+        kind: 后端类型（'memory' 或 'redis'）
+        url: Redis 连接地址（kind 为 'redis' 时使用）
+
+    Returns:
+        状态存储后端实例
+    """
+    if kind == 'redis':
+        return RedisStateBackend(url or "redis://127.0.0.1:6379/0")
+    return MemoryStateBackend()
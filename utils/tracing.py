@@ -0,0 +1,198 @@
+"""
+交互追踪模块
+为每次消息处理生成追踪ID，记录各阶段耗时，按采样率写入滚动的 JSONL 文件
+"""
+
+import contextvars
+import logging
+import os
+import random
+import time
+import uuid
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from .codec import dumps
+
+
+# 当前协程所在的阶段，新建阶段以其为父阶段（asyncio 任务创建时继承，并发的子任务互不干扰）
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """一个计时阶段，可作为 with 语句的上下文管理器，在另一个阶段内开始时记录为其子阶段"""
+
+    __slots__ = ('trace', 'id', 'name', 'attrs', 'start', 'duration', 'error', 'parent', 'depth', '_token')
+
+    def __init__(self, trace: "Trace", name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.id = trace.next_span_id()
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self.parent: Optional[int] = None
+        self.depth = 0
+        self._token = None
+
+    def set(self, **attrs):
+        """补充阶段属性"""
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        if parent is not None and parent.trace is self.trace:
+            self.parent = parent.id
+            self.depth = parent.depth + 1
+        self._token = _current_span.set(self)
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.monotonic() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.trace.spans.append(self)
+        return False
+
+
+class Trace:
+    """一次交互的追踪记录"""
+
+    def __init__(self, tracer: "Tracer", name: str, sampled: bool, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.sampled = sampled
+        self.attrs = attrs
+        self.spans: List[Span] = []
+        self._span_ids = 0
+        self.start_wall = time.time()
+        self.start = time.monotonic()
+
+    def next_span_id(self) -> int:
+        """分配追踪内唯一的阶段ID"""
+        self._span_ids += 1
+        return self._span_ids
+
+    def span(self, name: str, **attrs) -> Span:
+        """
+        创建计时阶段
+
+        Args:
+            name: 阶段名称，如 'search_music'
+            attrs: 阶段属性
+
+        Returns:
+            Span 上下文管理器
+        """
+        return Span(self, name, attrs)
+
+    def finish(self, **attrs):
+        """
+        结束追踪，按采样结果或慢请求阈值写入文件
+
+        Args:
+            attrs: 补充的追踪属性
+        """
+        self.attrs.update(attrs)
+        self.tracer.record(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可序列化的字典"""
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'time': self.start_wall,
+            'duration_ms': round((time.monotonic() - self.start) * 1000, 2),
+            'attrs': self.attrs,
+            'spans': [
+                {
+                    'id': span.id,
+                    'parent': span.parent,
+                    'depth': span.depth,
+                    'name': span.name,
+                    'offset_ms': round((span.start - self.start) * 1000, 2),
+                    'duration_ms': round(span.duration * 1000, 2),
+                    'attrs': span.attrs,
+                    'error': span.error,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+class Tracer:
+    """追踪记录器"""
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 0.05,
+        slow_threshold_ms: float = 3000,
+        max_bytes: int = 5 * 1024 * 1024,
+        backup_count: int = 3
+    ):
+        """
+        初始化追踪记录器
+
+        Args:
+            path: JSONL 文件路径
+            sample_rate: 采样率（0~1），为0时只记录慢请求
+            slow_threshold_ms: 超过该耗时的追踪无论是否采样都会记录
+            max_bytes: 单个文件大小上限，超出后滚动
+            backup_count: 保留的历史文件数
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._logger: Optional[logging.Logger] = None
+
+    def _get_logger(self) -> logging.Logger:
+        """首次写入时创建滚动文件日志"""
+        if self._logger is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            logger = logging.getLogger(f"musiclink.trace.{id(self)}")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def start_trace(self, name: str, **attrs) -> Trace:
+        """
+        开始一次追踪
+
+        Args:
+            name: 追踪名称
+            attrs: 追踪属性
+
+        Returns:
+            Trace 对象
+        """
+        return Trace(self, name, random.random() < self.sample_rate, attrs)
+
+    def record(self, trace: Trace):
+        """
+        写入追踪记录（没有任何阶段的追踪不写入）
+
+        Args:
+            trace: 已结束的追踪
+        """
+        if not trace.spans:
+            return
+        record = trace.to_dict()
+        if not trace.sampled and record['duration_ms'] < self.slow_threshold_ms:
+            return
+        try:
+            self._get_logger().info(dumps(record).decode('utf-8'))
+        except Exception as e:
+            print(f"写入追踪记录失败: {str(e)}")
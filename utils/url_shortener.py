@@ -6,6 +6,9 @@
 import aiohttp
 from typing import Optional, Dict, Any
 
+from .deadline import Deadline, stage_timeout
+from .http_pool import shared_session
+
 
 class URLShortener:
     """短链接服务"""
@@ -28,12 +31,13 @@ class URLShortener:
             }
         ]
 
-    async def shorten_url(self, long_url: str) -> str:
+    async def shorten_url(self, long_url: str, deadline: Optional[Deadline] = None) -> str:
         """
         将长链接转换为短链接
 
         Args:
             long_url: 需要缩短的长链接
+            deadline: 交互截止时间（可选），超时后不再尝试其他服务
 
         Returns:
             缩短后的链接，如果失败则返回原链接
@@ -45,10 +49,12 @@ class URLShortener:
         if len(long_url) < 50:
             return long_url
 
-        # 尝试多个短链接服务
+        # 尝试多个短链接服务，只在剩余时间内尝试下一个
         for service in self.services:
+            if deadline is not None and deadline.expired:
+                break
             try:
-                short_url = await self._try_service(service, long_url)
+                short_url = await self._try_service(service, long_url, deadline)
                 if short_url and short_url != long_url:
                     return short_url
             except Exception as e:
@@ -58,85 +64,99 @@ class URLShortener:
         # 如果所有服务都失败，返回原链接
         return long_url
 
-    async def _try_service(self, service: Dict[str, Any], long_url: str) -> Optional[str]:
+    async def _try_service(
+        self, service: Dict[str, Any], long_url: str, deadline: Optional[Deadline] = None
+    ) -> Optional[str]:
         """
         尝试使用指定的短链接服务
 
         Args:
             service: 服务配置
             long_url: 长链接
+            deadline: 交互截止时间（可选）
 
         Returns:
             短链接或None
         """
-        async with aiohttp.ClientSession() as session:
-            try:
-                if service['method'] == 'get':
-                    params = service['params'](long_url)
-                    async with session.get(
-                        service['url'],
-                        params=params,
-                        timeout=aiohttp.ClientTimeout(total=10)
-                    ) as response:
-                        if response.status == 200:
-                            result = await response.text()
-                            return result.strip()
-                else:  # POST
-                    data = service['data'](long_url)
-                    async with session.post(
-                        service['url'],
-                        data=data,
-                        timeout=aiohttp.ClientTimeout(total=10)
-                    ) as response:
-                        if response.status == 200:
-                            result = await response.text()
-                            return result.strip()
-            except Exception as e:
-                raise e
+        session = shared_session()
+        try:
+            if service['method'] == 'get':
+                params = service['params'](long_url)
+                async with session.get(
+                    service['url'],
+                    params=params,
+                    timeout=aiohttp.ClientTimeout(total=stage_timeout(deadline, 10))
+                ) as response:
+                    if response.status == 200:
+                        result = await response.text()
+                        return result.strip()
+            else:  # POST
+                data = service['data'](long_url)
+                async with session.post(
+                    service['url'],
+                    data=data,
+                    timeout=aiohttp.ClientTimeout(total=stage_timeout(deadline, 10))
+                ) as response:
+                    if response.status == 200:
+                        result = await response.text()
+                        return result.strip()
+        except Exception as e:
+            raise e
 
         return None
 
-    async def shorten_multiple_urls(self, urls: Dict[str, str]) -> Dict[str, str]:
+    async def shorten_multiple_urls(self, urls: Dict[str, str], deadline: Optional[Deadline] = None) -> Dict[str, str]:
         """
         批量缩短多个URL
 
         Args:
             urls: 键值对，键为标识，值为长链接
+            deadline: 交互截止时间（可选）
 
         Returns:
             缩短后的URL字典
         """
         result = {}
         for key, url in urls.items():
-            result[key] = await self.shorten_url(url)
+            result[key] = await self.shorten_url(url, deadline)
         return result
 
 
-# 全局短链接服务实例
-_url_shortener = URLShortener()
+# 全局短链接服务实例（首次使用时创建）
+_url_shortener: Optional[URLShortener] = None
+
+
+def _get_url_shortener() -> URLShortener:
+    """获取全局短链接服务实例"""
+    global _url_shortener
+    if _url_shortener is None:
+        _url_shortener = URLShortener()
+    return _url_shortener
 
 
-async def shorten_url(long_url: str) -> str:
+async def shorten_url(long_url: str, deadline: Optional[Deadline] = None) -> str:
     """
     便捷函数：缩短单个URL
 
     Args:
         long_url: 长链接
+        deadline: 交互截止时间（可选）
 
     Returns:
         短链接
     """
-    return await _url_shortener.shorten_url(long_url)
+    return await _get_url_shortener().shorten_url(long_url, deadline)
 
 
-async def shorten_urls(urls: Dict[str, str]) -> Dict[str, str]:
+async def shorten_urls(urls: Dict[str, str], deadline: Optional[Deadline] = None) -> Dict[str, str]:
     """
     便捷函数：批量缩短URL
 
     Args:
         urls: URL字典
+        deadline: 交互截止时间（可选）
 
     Returns:
         短链接字典
     """
-    return await _url_shortener.shorten_multiple_urls(urls)
\ No newline at end of file
+    return await _get_url_shortener().shorten_multiple_urls(urls, deadline)
\ No newline at end of file